@@ -14,9 +14,6 @@ y la ejecución de operaciones embebidas.
 https://github.com/Sofoclesias/music-source-separation
 """
 
-import warnings
-import os
-
 from .constants import (
     LABELS, STEMS_PATH
 )
@@ -25,34 +22,19 @@ from .common import (
     download_datasets, download_stems, read_from_jams
 )
 
-stream_handler = os.popen('sox -h')
-if not len(stream_handler.readlines()):    
-    warnings.warn("""No se ha encontrado el programa SoX.
-                  
-    La confección de audios aleatorios mediante .JAMS requiere
-    de este programa.
-
-    Para descargarlo, proceder acá:
-     - - - http://sox.sourceforge.net/ - - -
-
-    O descárguelo por chocolatey.
-    """)
-stream_handler.close()
-
-if not os.path.exists(STEMS_PATH):
-    warnings.warn("""No se ha encontrado el directorio de stems.
-                  
-    La confección de audios aleatorios mediante .JAMS requiere
-    de esta carpeta en audiomancy/common.
-    
-    Para descargarlo, correr las siguientes líneas de código en 
-    su directorio raíz:
-    
-    >import audiomancy
-    >audiomancy.common.download_stems() 
-    
-    O descárguelo directamente desde https://mega.nz/file/eUwHCLCJ#7g4qRZnCxxgnQyY8WzWaWAjg14k_D59FiJRjLyz1MJo
-    """)
+_LAZY = {'audioprocessing', 'rendering', 'dsp', 'stemstore', 'stemindex', 'dataset', 'metrics', 'environment', 'augmentation', 'features', 'eventcache', 'bucketing', 'tiers', 'models'}
+
+def __getattr__(name):
+    # Los submódulos con dependencias pesadas (scaper, librosa, jams...)
+    # se importan recién cuando se usan: import audiomancy no carga nada
+    # de eso ni revisa SoX (ver audiomancy.environment).
+    if name in _LAZY:
+        import importlib
+        return importlib.import_module(f'.{name}', __name__)
+    if name == 'cacophony':
+        from .audioprocessing import cacophony
+        return cacophony
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __version__ = "v0.0.1"
 
@@ -28,45 +28,285 @@ for Soundscape Synthesis and Augmentation"
 import numpy as np
 np.float_ = np.float64
 np.Inf = np.inf
-import scaper
-import librosa
+import soundfile
+import hashlib
+import json
 import os
-from tqdm import tqdm
 import shutil
+import warnings
+import weakref
+from tqdm import tqdm
 import jams
+from .common.jamsio import load_annotations, JamsWriter
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def remove_silence(audio_path):
+def _gather(audio, intervals):
+    """Concatena los intervalos no silenciosos en una sola reserva."""
+    if len(intervals) == 0:
+        return np.zeros((0,), dtype=audio.dtype)
+    return np.concatenate([audio[start:end] for start, end in intervals])
+
+def remove_silence(audio_path, top_db: float = 60, sr: int = 44100):
     """Elimina los espacios silenciosos en una pista de audio.
     Si se dan un enlace de directorio, carga el archivo.
     """
-    audio, _ = librosa.load(audio_path,sr=44100)
+    import librosa
     
-    non_silent = librosa.effects.split(audio,top_db=60)
-    audio_rel = np.empty((1,))
+    if isinstance(audio_path, str):
+        audio, _ = librosa.load(audio_path,sr=sr)
+    else:
+        audio = np.asarray(audio_path)
     
-    for start, end in non_silent:
-        audio_rel = np.hstack((audio_rel,audio[start:end+1]))
+    non_silent = librosa.effects.split(audio,top_db=top_db)
         
-    return audio_rel
+    return _gather(audio, non_silent)
+
+def _remove_silence_blocks(audio_path: str, out_path: str, top_db: float, block_seconds: float, frame_length: int = 2048, hop_length: int = 512):
+    """Versión por bloques de remove_silence para archivos muy largos.
+    
+    librosa.effects.split mide el silencio respecto del pico de RMS de
+    toda la pista, así que se hacen dos pasadas: la primera solo busca
+    ese pico y la segunda recorta cada bloque con esa referencia y lo
+    escribe al archivo de salida. En memoria nunca hay más de un bloque.
+    """
+    import librosa
+    
+    info = soundfile.info(audio_path)
+    block = max(1, int(block_seconds * info.samplerate) // hop_length) * hop_length
+    
+    ref = 0.0
+    for chunk in soundfile.blocks(audio_path, blocksize=block, dtype='float32', always_2d=True):
+        rms = librosa.feature.rms(y=chunk.mean(axis=1), frame_length=frame_length, hop_length=hop_length)
+        ref = max(ref, float(rms.max()))
+    
+    with soundfile.SoundFile(out_path, 'w', samplerate=info.samplerate, channels=1, format=info.format, subtype=info.subtype) as out:
+        for chunk in soundfile.blocks(audio_path, blocksize=block, dtype='float32', always_2d=True):
+            mono = chunk.mean(axis=1)
+            if ref > 0:
+                out.write(_gather(mono, librosa.effects.split(mono, top_db=top_db, ref=ref, frame_length=frame_length, hop_length=hop_length)))
+
+def _trim_file(audio_path: str, top_db: float, sr: int, block_seconds: float):
+    """Recorta los silencios de un stem y lo sobrescribe en su mismo
+    formato (WAV, FLAC...) y subtipo. Primero se escribe a un .tmp y luego
+    se reemplaza, así que un corte a medias no deja el stem dañado.
+    Devuelve el mtime y tamaño del resultado.
+    """
+    tmp_path = audio_path + '.tmp'
+    info = soundfile.info(audio_path)
+    
+    if info.samplerate == sr and info.duration > block_seconds:
+        _remove_silence_blocks(audio_path, tmp_path, top_db, block_seconds)
+    else:
+        soundfile.write(tmp_path, remove_silence(audio_path, top_db=top_db, sr=sr), sr, format=info.format, subtype=info.subtype)
+    
+    os.replace(tmp_path, audio_path)
+    stat = os.stat(audio_path)
+    
+    return {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'sha1': _sha1(audio_path), 'top_db': top_db}
+
+def _sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(2**20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def preprocess_stems(stems_path: str | None = None, top_db: float = 60, sr: int = 44100, workers: int = 1, block_seconds: float = 600):
+    """Elimina los silencios de todos los stems, en su mismo lugar.
+    
+    Lleva un manifiesto (.preprocessed.json en la carpeta de stems) con
+    el mtime, tamaño, hash y top_db de cada archivo ya recortado. Al
+    volver a correr, los archivos sin cambios se saltan, de modo que
+    ningún stem se recorta dos veces. Los archivos se procesan en
+    paralelo y los más largos que block_seconds se procesan por bloques.
+
+    Args:
+        stems_path (str, optional): Carpeta de stems. Por defecto, STEMS_PATH.
+        top_db (float, optional): Umbral bajo el pico (dB) para considerar
+        silencio. Por defecto, 60.
+        sr (int, optional): Frecuencia de muestreo de salida. Por defecto,
+        44100 hercios.
+        workers (int, optional): Procesos en paralelo. Por defecto, 1.
+        block_seconds (float, optional): Duración a partir de la cual un
+        archivo se procesa por bloques. Por defecto, 600 segundos.
+
+    Returns:
+        dict: Manifiesto actualizado.
+    """
+    from .constants import STEMS_PATH
+    
+    if stems_path is None:
+        stems_path = STEMS_PATH
+    else:
+        pass
+    
+    manifest_path = os.path.join(stems_path, '.preprocessed.json')
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    
+    def save():
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(manifest_path + '.tmp', manifest_path)
+    
+    pending = []
+    for root, _, files in os.walk(stems_path):
+        for file in sorted(files):
+            if not file.lower().endswith(('.wav', '.flac')):
+                continue
+            
+            path = os.path.join(root, file)
+            key = os.path.relpath(path, stems_path).replace(os.sep, '/')
+            entry = manifest.get(key)
+            
+            if entry is not None:
+                stat = os.stat(path)
+                if (entry['mtime'], entry['size']) != (stat.st_mtime_ns, stat.st_size) and entry['sha1'] == _sha1(path):
+                    entry.update(mtime=stat.st_mtime_ns, size=stat.st_size)  # Solo cambió el mtime.
+                elif (entry['mtime'], entry['size']) != (stat.st_mtime_ns, stat.st_size):
+                    pending.append((key, path))    # Archivo reemplazado: recortar de nuevo.
+                    continue
+                
+                if entry['top_db'] != top_db:
+                    warnings.warn(f'{key} ya fue recortado con top_db={entry["top_db"]}; no se vuelve a recortar.')
+            else:
+                pending.append((key, path))
+    
+    print(f'Eliminando silencios de {len(pending)} stems.')
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool, tqdm(total=len(pending)) as bar:
+            futures = {pool.submit(_trim_file, path, top_db, sr, block_seconds): key for key, path in pending}
+            for future in as_completed(futures):
+                manifest[futures[future]] = future.result()
+                save()
+                bar.update(1)
+    else:
+        for key, path in tqdm(pending):
+            manifest[key] = _trim_file(path, top_db, sr, block_seconds)
+            save()
+    
+    save()
+    return manifest
 
-def normalize_track(arr,length = 220500): 
+def normalize_track(arr,length: int | None = None, sr: int = 44100, duration: float = 5.0): 
     """Si se encuentran diferencias con la longitud dada, agrega
     ceros como elementos de array o recorta su longitud. El objetivo
     es que todos los archivos de audio tengan la misma extensión de 
-    segundos de muestreo frecuencial.    
+    segundos de muestreo frecuencial. El primer eje es el de las
+    muestras: sirve para pistas 1D y para arrays (muestras, canales).
+    Sin length, se usan duration segundos a sr (220500 muestras por
+    defecto).
     """
+    from .tiers import n_samples
+    
+    length = length if length is not None else n_samples(duration, sr)
     if arr.shape[0] < length:
-        return np.hstack((arr,np.zeros((length - arr.shape[0],1),dtype='float64')))
+        out = np.zeros((length,) + arr.shape[1:], dtype=arr.dtype)
+        out[:arr.shape[0]] = arr
+        return out
     elif arr.shape[0] > length:
         return arr[:length]
     else:
         return arr
 
+_segments = {}
+"""Bloques de memoria compartida de los arrays de _shared_array,
+por id del array. Cada entrada se borra cuando su array se libera.
+"""
+
+def _release_segment(key: int):
+    shm = _segments.pop(key)
+    shm.close()
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+def _shared_array(shape: tuple, dtype):
+    """Array en ceros sobre un bloque nuevo de memoria compartida. El
+    bloque vive mientras viva el array (o alguna de sus vistas).
+    """
+    nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)     # Los bloques nuevos vienen en ceros.
+    
+    _segments[id(array)] = shm
+    weakref.finalize(array, _release_segment, id(array))
+    return array
+
+_worker = {}
+"""Estado de cada proceso de reconstrucción en paralelo: el mezclador
+y las vistas a los tensores compartidos.
+"""
+
+def _init_worker(mixer, X_spec: tuple, Y_spec: tuple, dtype: str):
+    """Inicializador de cada proceso del pool. Se conecta a la memoria
+    compartida de X e Y.
+    """
+    X_shm = shared_memory.SharedMemory(name=X_spec[0])
+    Y_shm = shared_memory.SharedMemory(name=Y_spec[0])
+    
+    _worker['mixer'] = mixer
+    _worker['shm'] = (X_shm, Y_shm)    # Referencias para que no se cierren.
+    _worker['X'] = np.ndarray(X_spec[1], dtype=dtype, buffer=X_shm.buf)
+    _worker['Y'] = np.ndarray(Y_spec[1], dtype=dtype, buffer=Y_shm.buf)
+
+def _init_worker_memmap(mixer, X_path: str, Y_path: str):
+    """Inicializador del pool cuando X e Y ya viven en disco: cada
+    proceso abre los mismos .npy con memmap y escribe en su lugar.
+    """
+    _worker['mixer'] = mixer
+    _worker['X'] = np.load(X_path, mmap_mode='r+')
+    _worker['Y'] = np.load(Y_path, mmap_mode='r+')
+
+def _render_chunk(chunk: tuple):
+    """Reconstruye un bloque contiguo de anotaciones y lo escribe en
+    su posición de los tensores compartidos. Devuelve cuántas se hicieron.
+    """
+    start, annotations = chunk
+    mixer = _worker['mixer']
+    
+    for i, ann in enumerate(annotations):
+        with mixer.metrics.stage('render'):
+            mix_audio, stem_list = mixer.render(ann)
+        with mixer.metrics.stage('stack'):
+            cacophony._write_sample(_worker['X'], _worker['Y'], start + i, mix_audio, stem_list)
+        
+    return len(annotations), mixer.metrics.pop_state()
+
+def _generate_shard_file(mixer, k: int, count: int, snr: tuple, pitch_shift: tuple, time_stretch: tuple, checkpoint_path: str):
+    """Genera el fragmento k de generate_random y lo guarda como punto
+    de control. La semilla sale de la semilla del mezclador y de k.
+    """
+    seed = int(np.random.SeedSequence(mixer.seed, spawn_key=(k,)).generate_state(1)[0])
+    
+    shard = jams.JAMS()
+    for ann in mixer._generate_mixes(seed, count, snr, pitch_shift, time_stretch):
+        shard.annotations.append(ann)
+    
+    with mixer.metrics.stage('checkpoint'):
+        shard_path = os.path.join(checkpoint_path, f'shard_{k:05d}.jams')
+        tmp_path = os.path.join(checkpoint_path, f'shard_{k:05d}.tmp.jams')  # jams exige la extensión .jams.
+        shard.save(tmp_path, strict=False)
+        os.replace(tmp_path, shard_path)
+    
+    return count
+
+def _generate_shard_worker(*args):
+    """_generate_shard_file dentro del pool: devuelve también las
+    métricas del proceso.
+    """
+    mixer = args[0]
+    return _generate_shard_file(*args), mixer.metrics.pop_state()
+
 class cacophony:
     """Clase que facilita la creación de muestras aleatorias y la carga
     de metadatos ya pre-confeccionados.
     """
-    def __init__(self, duration: float = 5.0, sampling: int = 44100, n_channels: int = 1, ref_db: int = -20, fg_path: str | None = None, seed: int = 42):
+    def __init__(self, duration: float = 5.0, sampling: int = 44100, n_channels: int = 1, ref_db: int = -20, fg_path: str | None = None, seed: int = 42, engine: str = 'sox', metrics = None):
         """Configura los hiperparámetros del creador de muestras
         aleatorias.
 
@@ -83,6 +323,13 @@ class cacophony:
             el rango de volúmenes de los audios (decibelios, dB). Por
             defecto, -20 dB.
             seed (int, optional): Semilla de aleatoriedad. 42.
+            engine (str, optional): Motor para reconstruir las mezclas:
+            'sox' (scaper y SoX) o 'numpy' (pitch shift y time stretch en
+            proceso, sin SoX; ver audiomancy.dsp). Por defecto, 'sox'.
+            metrics (Metrics, optional): Objeto de audiomancy.metrics que
+            acumula tiempos, histogramas y bytes de cada etapa de
+            read_from_jams, iter_from_jams y generate_random. Por defecto,
+            ninguno (sin costo).
             fg_path (str, optional): Directorio donde se ubican los audios.
             Por defecto, 'stems'. Los archivos dentro de esta carpeta
             deben estructurarse de la siguiente manera:
@@ -126,36 +373,150 @@ class cacophony:
         self.sr = sampling
         self.n_channels = n_channels
         self.ref_db = ref_db
+        self.store = None
+        self.stem_index = None
+        self.event_cache = None
+        self.engine = engine
+        
+        if metrics is None:
+            from .metrics import NULL_METRICS
+            self.metrics = NULL_METRICS
+        else:
+            self.metrics = metrics
         
         if fg_path is None:
             from .constants import STEMS_PATH
             self.fg_path = STEMS_PATH
+        else:
+            self.fg_path = fg_path
+    
+    def at_tier(self, sr: int, store_path: str | None = None):
+        """Mezclador igual a este, pero a otra frecuencia de muestreo
+        (ver audiomancy.tiers). Las mismas anotaciones se reconstruyen con
+        las muestras que correspondan a sr. Si este mezclador tiene un
+        almacén de stems, el del nuevo nivel se remuestrea una sola vez a
+        partir de él y queda en disco para las siguientes veces.
+
+        Args:
+            sr (int): Frecuencia de muestreo del nivel (p. ej. 22050 u 11025).
+            store_path (str, optional): Carpeta del almacén. Por defecto,
+            la del almacén actual.
+
+        Returns:
+            cacophony: Mezclador nuevo. Comparte métricas, índice y caché
+            de eventos (sus llaves incluyen sr).
+        """
+        import copy
+        from .stemstore import StemStore
+        
+        mixer = copy.copy(self)
+        mixer.sr = sr
+        
+        if self.store is not None and self.store.sr != sr:
+            mixer.store = StemStore.compile(fg_path=self.fg_path, sr=sr, store_path=store_path or self.store.store_path, source=self.store)
         else:
             pass
         
-    def generate_random(self, n: int = 1000, jams_path: str | None = None, snr: tuple = (-5, 5), pitch_shift: tuple = (-2, 2), time_stretch: tuple = (0.8, 1.2)):
+        return mixer
+    
+    def compile_stems(self, store_path: str | None = None, force: bool = False):
+        """Decodifica una sola vez todos los stems de fg_path a self.sr en
+        un almacén float32 mapeado en memoria (ver audiomancy.stemstore).
+        Desde entonces, read_from_jams y generate_random toman las ventanas
+        de cada evento del almacén en lugar de decodificar los .wav.
+        
+        Si algún stem cambió de mtime o tamaño, el almacén se reconstruye.
+
+        Args:
+            store_path (str, optional): Carpeta del almacén. Por defecto,
+            STORE_PATH.
+            force (bool, optional): Reconstruye aunque esté al día.
+
+        Returns:
+            StemStore: Almacén abierto.
+        """
+        from .stemstore import StemStore
+        
+        self.store = StemStore.compile(fg_path=self.fg_path, sr=self.sr, store_path=store_path, force=force)
+        return self.store
+    
+    def index_stems(self, index_path: str | None = None, top_db: float = 60, workers: int = 1, force: bool = False):
+        """Analiza una sola vez los stems de fg_path (duración, loudness,
+        regiones activas; ver audiomancy.stemindex). Desde entonces,
+        generate_random sortea los eventos con el índice, sin abrir ningún
+        audio y con las ventanas dentro de regiones activas, y el motor
+        nativo toma del índice la loudness de cada ventana.
+        
+        Si algún stem cambió de mtime o tamaño, se vuelve a analizar.
+
+        Args:
+            index_path (str, optional): Archivo del índice. Por defecto,
+            STEM_INDEX.
+            top_db (float, optional): Umbral de silencio (dB bajo el pico).
+            Por defecto, 60.
+            workers (int, optional): Procesos en paralelo. Por defecto, 1.
+            force (bool, optional): Reanaliza todo aunque esté al día.
+
+        Returns:
+            StemIndex: Índice abierto.
+        """
+        from .stemindex import StemIndex
+        
+        self.stem_index = StemIndex.build(fg_path=self.fg_path, index_path=index_path, top_db=top_db, workers=workers, force=force)
+        return self.stem_index
+    
+    def cache_events(self, cache_path: str | None = None, max_bytes: int = 10 * 2**30, quantize: tuple | None = None):
+        """Activa el caché en disco de eventos transformados (ver
+        audiomancy.eventcache). Desde entonces, read_from_jams e
+        iter_from_jams usan el motor nativo, toman de disco los eventos que
+        ya se transformaron y solo les aplican el SNR al mezclar.
+
+        Args:
+            cache_path (str, optional): Carpeta del caché. Por defecto,
+            EVENT_CACHE_PATH.
+            max_bytes (int, optional): Tamaño máximo en disco; al pasarlo se
+            borran los eventos menos usados. Por defecto, 10 GiB.
+            quantize (tuple, optional): Pasos (semitonos, factor) para
+            redondear pitch_shift y time_stretch y subir la tasa de
+            aciertos. Por defecto, None.
+
+        Returns:
+            EventCache: Caché abierto.
+        """
+        from .eventcache import EventCache
+        
+        self.event_cache = EventCache(cache_path=cache_path, max_bytes=max_bytes, quantize=quantize)
+        return self.event_cache
+        
+    def generate_random(self, n: int = 1000, jams_path: str | None = None, snr: tuple = (-5, 5), pitch_shift: tuple = (-2, 2), time_stretch: tuple = (0.8, 1.2), workers: int = 1, shard_size: int = 50):
         """Genera iterativamente metadatos de mixes. Por defecto, no
         exporta ninguna pista de audio para evitar sobrecargas de memoria.
         
-        La función crea una carpeta temporal ("temp") en el directorio
-        nativo de donde se llame al módulo. En esta se exportan los metadatos
-        individuales de Scaper, dado que el módulo trabajo solo con directorios
-        y por mixes individuales.
-        
-        Luego de la confección del archivo .jams completo, se borra "temp"
-        y todos los archivos transitorios. Queda en la carpeta nativa el
-        archivo .jams bajo el directorio indicado en 'jams_path'.
+        Los n mixes se reparten en fragmentos de shard_size, cada uno con
+        su propia semilla derivada de seed, y se pueden generar en paralelo.
+        Cada fragmento terminado se guarda como punto de control en la
+        carpeta jams_path + '.parts', junto al archivo de salida: si la
+        ejecución se corta, volver a llamar con los mismos argumentos
+        retoma desde los fragmentos pendientes. Las anotaciones se van
+        escribiendo en orden al archivo .jams de 'jams_path' a medida que
+        los fragmentos terminan, sin juntarlas en memoria. Al final se
+        borran los puntos de control.
 
         Args:
             n (int, optional): Cantidad de iteraciones. Por defecto, 1000.
             jams_path (str, optional): Directorio para exportar el archivo
-            .jams final. Por defecto, 'soundscapes.jams'.
+            .jams final. Por defecto, 'soundscapes.jams'. Con extensión .jsonl
+            se escribe una anotación por línea (ver common.jamsio.JamsWriter).
             snr (tuple, optional): Signal-to-Noise Ratio en decibelios (dB).
             Altera el volumen de la pista agregada. Por defecto, entre (-5, 5).
             pitch_shift (tuple, optional): Variación de tono en la pista agregada. 
             Por defecto, entre (-2, 2).
             time_stretch (tuple, optional): Extensión de tiempo en la pista
             agregada. Por defecto, entre (0.8, 1.2).
+            workers (int, optional): Procesos en paralelo. El resultado no
+            depende de este valor. Por defecto, 1.
+            shard_size (int, optional): Mixes por fragmento (y por punto de
+            control). Por defecto, 50.
         
         Las configuraciones de preprocesamiento especificadas se han considerado
         gracias a la investigación de "Why does music source separation benefit 
@@ -172,23 +533,102 @@ class cacophony:
         }
         """
         
-        from .constants import ABSOLUTE_PATH, TEMP_PATH, LABELS
+        from .constants import ABSOLUTE_PATH
         
         if jams_path is None:
             jams_path = os.path.join(ABSOLUTE_PATH,'common',f'{n}_soundscapes.jams')
         else:
             pass
         
-        if not os.path.exists(TEMP_PATH): # Creación de la carpeta "temp/"
-            print('Creada carpeta temporal para resguardar memoria.\n')
-            os.makedirs(TEMP_PATH,exist_ok=True)
+        from .environment import check_rendering
+        
+        # SoX hace falta con el motor 'sox' (aun desde el almacén, ver
+        # rendering._transform_sox) y cuando scaper sintetiza cada mezcla.
+        check_rendering(self.fg_path, needs_sox=self.engine == 'sox' or (self.store is None and self.stem_index is None))
         
+        n_shards = -(-n // shard_size)
+        config = {
+            'n': n, 'shard_size': shard_size, 'seed': self.seed,
+            'snr': list(snr), 'pitch_shift': list(pitch_shift), 'time_stretch': list(time_stretch),
+            'duration': self.duration, 'sr': self.sr, 'ref_db': self.ref_db, 'n_channels': self.n_channels
+        }
+        
+        # Junto a la salida: dos generaciones con el mismo nombre de archivo
+        # en carpetas distintas no comparten fragmentos.
+        checkpoint_path = jams_path + '.parts'
+        os.makedirs(checkpoint_path, exist_ok=True)
+        config_path = os.path.join(checkpoint_path, 'config.json')
+        
+        if os.path.exists(config_path):
+            with open(config_path, 'r', encoding='utf-8') as f:
+                if json.load(f) != config:
+                    raise ValueError(f'Hay una generación interrumpida con otra configuración en {checkpoint_path}. Bórrela para empezar de nuevo.')
+            print('Retomando generación interrumpida.')
+        else:
+            with open(config_path, 'w', encoding='utf-8') as f:
+                json.dump(config, f)
+        
+        pending = []
+        for k in range(n_shards):
+            count = min(shard_size, n - k * shard_size)
+            if not os.path.exists(os.path.join(checkpoint_path, f'shard_{k:05d}.jams')):
+                pending.append((k, count))
+        '''
+        Cada fragmento tiene su propia semilla, derivada de la semilla
+        general y del número de fragmento. Así, el resultado es el mismo
+        sin importar cuántos procesos se usen o en qué orden terminen.
+        '''
+        
+        done = set(range(n_shards)) - {k for k, _ in pending}
+        written = 0
+        
+        def flush(writer):
+            """Vuelca al archivo final los fragmentos ya terminados que
+            siguen en orden al último escrito. Solo hay un fragmento en
+            memoria a la vez.
+            """
+            nonlocal written
+            while written in done:
+                with self.metrics.stage('merge'):
+                    jam = jams.load(os.path.join(checkpoint_path, f'shard_{written:05d}.jams'), strict=False)
+                    for annot in jam.annotations:
+                        writer.write(annot)
+                written += 1
+        
+        print('Confeccionando mixes aleatorios.')
+        with JamsWriter(jams_path) as writer, tqdm(total=n, initial=n - sum(count for _, count in pending)) as bar:
+            flush(writer)
+            
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    futures = {
+                        pool.submit(_generate_shard_worker, self, k, count, snr, pitch_shift, time_stretch, checkpoint_path): k
+                        for k, count in pending
+                    }
+                    for future in as_completed(futures):
+                        count, state = future.result()
+                        self.metrics.merge(state)
+                        bar.update(count)
+                        done.add(futures[future])
+                        flush(writer)
+            else:
+                for k, count in pending:
+                    bar.update(_generate_shard_file(self, k, count, snr, pitch_shift, time_stretch, checkpoint_path))
+                    done.add(k)
+                    flush(writer)
+        
+        shutil.rmtree(checkpoint_path)
+        print('Creación de metadata terminada.\n')
+    
+    def _scaper(self, seed: int):
+        """Crea el objeto de scaper con los hiperparámetros del mezclador."""
+        import scaper
         
         sc = scaper.Scaper(             
                 duration=self.duration,  
                 fg_path=self.fg_path,
                 bg_path=self.fg_path,   
-                random_state=self.seed
+                random_state=seed
             )
         '''
         El objeto de scaper que conjunta las herramientas de preprocesamiento.
@@ -203,8 +643,21 @@ class cacophony:
         sc.n_channels = self.n_channels # Mono o estéreo.
         sc.ref_db = self.ref_db         # Volumen de referencia.
         
-        print('Confeccionando mixes aleatorios.')
-        for i in tqdm(range(n)):
+        return sc
+    
+    def _generate_mixes(self, seed: int, count: int, snr: tuple, pitch_shift: tuple, time_stretch: tuple) -> list:
+        """Genera count anotaciones de mixes con un scaper sembrado con seed."""
+        from .constants import LABELS
+        
+        if self.stem_index is not None:
+            return self._generate_indexed(seed, count, snr, pitch_shift, time_stretch)
+        else:
+            pass
+        
+        sc = self._scaper(seed)
+        annotations = []
+        
+        for _ in range(count):
             sc.reset_fg_event_spec()    # Reiniciar eventos del confeccionador para que no se acumulen. 
             
             for label in LABELS.keys():
@@ -223,80 +676,386 @@ class cacophony:
                 rango de valores dados, se escogerá una pista musical y se realizarán
                 todas las manipulaciones mencionadas.
                 '''
-                
-                sc.generate(jams_path=os.path.join(TEMP_PATH,f'soundscape_{i+1}.jams'),fix_clipping=True)
+            
+            with self.metrics.stage('generate'):
+                _, jam, _, _ = sc.generate(fix_clipping=True, no_audio=self.store is not None) # Una sola vez por mix, con los seis eventos.
+            ann = jam.search(namespace='scaper')[0]
+            
+            if self.store is not None:
+                self._store_sandbox(ann)
+            
+            annotations.append(ann)
+            self.metrics.count('mixes')
         
-        print('\nFusión de archivos .jams')
-        all_jams = jams.JAMS()
-        for jams_file in tqdm([os.path.join(TEMP_PATH,f) for f in os.listdir(TEMP_PATH)]):
-            jam = jams.load(jams_file,strict=False)
+        return annotations
+    
+    def _generate_indexed(self, seed: int, count: int, snr: tuple, pitch_shift: tuple, time_stretch: tuple) -> list:
+        """Como _generate_mixes, pero los eventos se sortean con el índice
+        de stems: sin scaper ni lecturas de audio, y con cada ventana en
+        una región activa del stem.
+        """
+        from .constants import LABELS
+        from .rendering import annotation_from_events
+        
+        rng = np.random.default_rng(seed)
+        annotations = []
+        
+        for _ in range(count):
+            with self.metrics.stage('generate'):
+                events = self.stem_index.sample_events(rng, list(LABELS.keys()), self.duration, snr, pitch_shift, time_stretch)
+                ann = annotation_from_events(events, self.fg_path, self.duration, self.sr, self.ref_db, self.n_channels, fix_clipping=True)
             
-            for annot in jam.annotations:
-                all_jams.annotations.append(annot) # Combina todo en un mismo archivo.
-                
-        all_jams.save(jams_path,strict=False)
-        shutil.rmtree(TEMP_PATH)
-        print('Creación de metadata terminada. Eliminada carpeta temporal.\n')
+            if self.store is not None:
+                self._store_sandbox(ann)
+            
+            annotations.append(ann)
+            self.metrics.count('mixes')
+        
+        return annotations
+        
+    def render(self, events, duration: float | None = None):
+        """Reconstruye una sola mezcla en memoria, sin pasar por archivos
+        .jams temporales (ver audiomancy.rendering).
+
+        Args:
+            events (jams.Annotation | list): Anotación del namespace 'scaper'
+            o lista de eventos (diccionarios con label, source_file,
+            source_time, event_duration, snr, pitch_shift y time_stretch).
+            duration (float, optional): Duración de esta mezcla (segundos).
+            Por defecto, la de la anotación o, si no tiene, la del mezclador.
+
+        Returns:
+            mix_audio: Array (muestras, canales) de la mezcla.
+            stem_list: Lista con un array (muestras, canales) por pista.
+        """
+        from .rendering import render_events
+        from .environment import check_rendering
+        
+        check_rendering(self.fg_path, needs_sox=self.engine == 'sox')
+        
+        if duration is None and isinstance(events, jams.Annotation) and events.duration is not None:
+            duration = events.duration
+        else:
+            pass
+        
+        return render_events(
+            events,
+            fg_path=self.fg_path,
+            duration=duration if duration is not None else self.duration,
+            sr=self.sr,
+            ref_db=self.ref_db,
+            n_channels=self.n_channels,
+            store=self.store,
+            engine=self.engine,
+            metrics=self.metrics,
+            stem_index=self.stem_index,
+            event_cache=self.event_cache
+        )
+    
+    def _store_sandbox(self, ann):
+        """Con el almacén de stems, scaper genera solo los metadatos
+        (no_audio) y la mezcla se sintetiza desde el memmap. Se completan
+        en el sandbox los mismos campos de normalización que deja scaper.
+        """
+        from .rendering import _render_native, events_from_annotation
+        
+        _, _, scale_factor = _render_native(
+            events_from_annotation(ann), self.fg_path, self.store, self.engine,
+            self.duration, self.sr, self.ref_db, self.n_channels,
+            fix_clipping=True, fade_in_len=0.01, fade_out_len=0.01, metrics=self.metrics, stem_index=self.stem_index
+        )
+        ref_db_change = 20 * np.log10(scale_factor)
+        
+        ann.sandbox.scaper.update(
+            no_audio=False,
+            peak_normalization_scale_factor=scale_factor,
+            ref_db_change=ref_db_change,
+            ref_db_generated=self.ref_db + ref_db_change
+        )
+    
+    def _shapes(self, n: int):
+        """Dimensiones de los tensores X (n, canales, L) e Y
+        (n, canales, L, 6) para n mezclas.
+        """
+        from .constants import LABELS
+        
+        from .tiers import n_samples
+        
+        length = n_samples(self.duration, self.sr)
+        return (n, self.n_channels, length), (n, self.n_channels, length, len(LABELS))
+    
+    def _allocate(self, n: int, dtype = 'float64', max_memory: int | None = None, scratch_path: str | None = None, shared: bool = False):
+        """Reserva los tensores de salida X e Y para n mezclas. Si pesan
+        más que max_memory (bytes), se crean como .npy mapeados en memoria
+        en una carpeta nueva dentro de scratch_path (por defecto, TEMP_PATH).
+        Con shared, los que caben en memoria se reservan en memoria
+        compartida, donde _render_parallel escribe sin copiar al final.
+        """
+        shape_X, shape_Y = self._shapes(n)
+        nbytes = int(np.prod(shape_X) + np.prod(shape_Y)) * np.dtype(dtype).itemsize
+        
+        if max_memory is None or nbytes <= max_memory:
+            with self.metrics.stage('allocate', nbytes=nbytes):
+                if shared:
+                    return _shared_array(shape_X, dtype), _shared_array(shape_Y, dtype)
+                else:
+                    return np.zeros(shape_X, dtype=dtype), np.zeros(shape_Y, dtype=dtype)
+        else:
+            pass
+        
+        from .constants import TEMP_PATH
+        import tempfile
+        
+        scratch_path = scratch_path if scratch_path is not None else TEMP_PATH
+        os.makedirs(scratch_path, exist_ok=True)
+        
+        _, _, free = shutil.disk_usage(scratch_path)
+        if free < nbytes:
+            raise MemoryError(f"Los tensores pesan {nbytes / 2**30:.2f} GB y superan max_memory, pero en {scratch_path} solo hay {free / 2**30:.2f} GB libres.")
+        
+        folder = tempfile.mkdtemp(prefix='tensors_', dir=scratch_path)
+        print(f'Los tensores pesan {nbytes / 2**30:.2f} GB (límite: {max_memory / 2**30:.2f} GB). Se escribirán en {folder}.')
+        
+        with self.metrics.stage('allocate'):
+            X = np.lib.format.open_memmap(os.path.join(folder, 'X.npy'), mode='w+', dtype=dtype, shape=shape_X)
+            Y = np.lib.format.open_memmap(os.path.join(folder, 'Y.npy'), mode='w+', dtype=dtype, shape=shape_Y)
+        
+        return X, Y
+    
+    @staticmethod
+    def _write_sample(X, Y, i: int, mix_audio, stem_list):
+        """Escribe una mezcla reconstruida directamente en la fila i de
+        los tensores X e Y. Equivale a normalize_track, pero sin crear
+        arrays intermedios: lo que sobra se recorta y lo que falta queda
+        en cero.
+        """
+        length = X.shape[-1]
         
-    def read_from_jams(self,jams_path: str | None = None):
+        n = min(mix_audio.shape[0], length)
+        X[i] = 0
+        X[i, :, :n] = mix_audio[:n].T
+        
+        Y[i] = 0
+        for k, stem_audio in enumerate(stem_list):
+            n = min(stem_audio.shape[0], length)
+            Y[i, :, :n, k] = stem_audio[:n].T
+    
+    def _render_parallel(self, annotations, X, Y, workers: int, chunksize: int = 8):
+        """Reparte las anotaciones en bloques entre un pool de procesos.
+        Cada proceso escribe sus mezclas directamente en X e Y según su
+        índice, así que el orden de salida es el mismo que el del archivo
+        .jams sin importar qué proceso termine primero. X e Y deben venir
+        de _allocate con shared (memoria compartida) o ser memmaps de .npy,
+        que los procesos abren en lugar de usar memoria compartida.
+        """
+        n = len(annotations)
+        if n == 0:
+            return
+        
+        chunks = [(start, list(annotations[start:start+chunksize])) for start in range(0, n, chunksize)]
+        
+        if isinstance(X, np.memmap) and isinstance(Y, np.memmap):
+            # Ya están en disco: los procesos escriben en los mismos archivos.
+            self._run_chunks(chunks, workers, _init_worker_memmap, (self, X.filename, Y.filename))
+            X.flush()
+            Y.flush()
+            return
+        else:
+            pass
+        
+        if id(X) not in _segments or id(Y) not in _segments:
+            raise ValueError('X e Y deben reservarse con _allocate(..., shared=True) o ser memmaps.')
+        else:
+            pass
+        
+        self._run_chunks(chunks, workers, _init_worker, (self, (_segments[id(X)].name, X.shape), (_segments[id(Y)].name, Y.shape), X.dtype.str))
+    
+    def _run_chunks(self, chunks: list, workers: int, initializer, initargs: tuple):
+        """Reconstruye los bloques en un pool de procesos inicializado
+        con initializer e initargs, juntando sus métricas.
+        """
+        with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool, tqdm(total=sum(len(chunk[1]) for chunk in chunks)) as bar:
+            for done, state in pool.map(_render_chunk, chunks):
+                self.metrics.merge(state)
+                bar.update(done)
+    
+    def read_from_jams(self,jams_path: str | None = None, dtype = 'float64', workers: int = 1, rank: int = 0, world_size: int = 1, epoch: int | None = None, max_memory: int | None = None, scratch_path: str | None = None):
         """Sea para cargar los datos que recién crees o para el archivo
         .jams compartido, con este método reconstruyes los audios en
         tensores de numpy para el procesamiento posterior.
         
+        Los tensores se reservan una sola vez con el número de anotaciones
+        y cada mezcla se escribe directamente en su posición. Si el archivo
+        es muy grande para la memoria, usar iter_from_jams.
+        
         Args:
-            jams_path (str, optional): Ubicación del archivo .jams.
+            jams_path (str, optional): Ubicación del archivo .jams, o de su
+            índice columnar .npz (ver audiomancy.common.jamsio), que se lee
+            sin parsear el JSON completo.
+            dtype (optional): Tipo de dato de los tensores. Por defecto,
+            'float64'.
+            workers (int, optional): Número de procesos para reconstruir las
+            mezclas en paralelo. Por defecto, 1 (secuencial).
+            rank (int, optional): Nodo actual en entrenamiento distribuido.
+            Por defecto, 0.
+            world_size (int, optional): Número de nodos. Cada uno lee,
+            reconstruye y guarda solo su parte del archivo (ver
+            common.jamsio.shard_indices); entre todos cubren cada mezcla una
+            vez. Por defecto, 1.
+            epoch (int, optional): Si se indica, las mezclas se rebarajan con
+            (seed del mezclador, epoch) antes de repartirlas. Por defecto,
+            None.
+            max_memory (int, optional): Presupuesto de memoria (bytes) para
+            X e Y. El tamaño se calcula antes de reconstruir, con el número
+            de anotaciones, duration, sr y dtype; si lo supera, X e Y se
+            devuelven como np.memmap (.npy en una carpeta nueva dentro de
+            scratch_path) y cada mezcla se escribe directo en disco. Por
+            defecto, None (siempre en memoria).
+            scratch_path (str, optional): Carpeta donde crear los .npy. Por
+            defecto, TEMP_PATH. Los archivos no se borran solos: su ruta
+            está en X.filename e Y.filename.
         
         Returns
             X: Array del mix con todas las frecuencias unidas. Dimensiones:
             (n_files, marco 1D (1), frecuencias)
             Y: Array del mix con todas las frecuencias separadas. Dimensiones:
             (n_files, marco 1D (1), frecuencias, pistas separadas (6))
+            Con world_size > 1 o epoch, la fila i es la mezcla
+            shard_indices(n, rank, world_size, epoch, seed)[i] del archivo.
         """
         
-        from .constants import STEMS_PATH, TEMP_PATH, JAMS_FILE_200
+        from .constants import JAMS_FILE_200
         
         if jams_path is None:
             jams_path = JAMS_FILE_200
         else:
             pass
         
-        if not os.path.exists(TEMP_PATH): # Creación de la carpeta "temp/"
-            print('Creada carpeta temporal para resguardar memoria.\n')
-            os.makedirs(TEMP_PATH,exist_ok=True)
-        
-        mixtures = []
-        stems = []
+        with self.metrics.stage('parse'):
+            annotations = load_annotations(jams_path, rank, world_size, epoch, self.seed)
+        X, Y = self._allocate(len(annotations), dtype, max_memory, scratch_path, shared=workers > 1)
         
         print('Reconstrucción de audios.')
-        for ann in tqdm(jams.load(jams_path,strict=False).annotations):
-            temp = jams.JAMS()
-            temp.annotations.append(ann)
-            temp.file_metadata.duration = 5.0           # Sin esto, suelta error.
-            temp.save(os.path.join(TEMP_PATH,'temp.jams'),strict=False)
-            """De nuevo, como Scaper trabaja con directorios y no con
-            arrays, es necesario exportar cada elemento del archivo .jams
-            en uno individual.
-            
-            Por ello, se vuelve a utilizar la carpeta temporal "temp". 
-            """        
+        if workers > 1:
+            self._render_parallel(annotations, X, Y, workers)
+        else:
+            for i, ann in enumerate(tqdm(annotations)):
+                with self.metrics.stage('render'):
+                    mix_audio, stem_list = self.render(ann)
+                with self.metrics.stage('stack'):
+                    self._write_sample(X, Y, i, mix_audio, stem_list)
             
-            mix_audio, _, _, stem_list = scaper.generate_from_jams(
-                jams_infile = os.path.join(TEMP_PATH,'temp.jams'),
-                fg_path = STEMS_PATH,
-                bg_path = STEMS_PATH
-            )
+            if isinstance(X, np.memmap):
+                X.flush()
+                Y.flush()
+            else:
+                pass
+        
+        return X, Y
+    
+    def iter_from_jams(self, jams_path: str | None = None, batch_size: int = 32, dtype = 'float32', rank: int = 0, world_size: int = 1, epoch: int | None = None):
+        """Versión por lotes de read_from_jams. En lugar de reconstruir
+        todo el archivo .jams de golpe, entrega pares (X_batch, Y_batch)
+        de a lo más batch_size mezclas, de modo que el pico de memoria
+        solo depende del tamaño del lote.
+        
+        Los buffers de cada lote se reservan una sola vez y se reutilizan
+        en cada iteración: si se necesita conservar un lote, copiarlo
+        (X_batch.copy()) antes de pedir el siguiente.
+        
+        Args:
+            jams_path (str, optional): Ubicación del archivo .jams, o de su
+            índice columnar .npz (ver audiomancy.common.jamsio), que se lee
+            sin parsear el JSON completo.
+            batch_size (int, optional): Mezclas por lote. Por defecto, 32.
+            dtype (optional): Tipo de dato de los buffers ('float32',
+            'float16', ...). Por defecto, 'float32'.
+            rank, world_size, epoch (optional): Reparto entre nodos, como en
+            read_from_jams.
+        
+        Yields:
+            X_batch: Array (batch, marco 1D (1), frecuencias).
+            Y_batch: Array (batch, marco 1D (1), frecuencias, pistas separadas (6)).
+            El último lote puede ser más corto.
+        """
+        
+        from .constants import JAMS_FILE_200
+        
+        if jams_path is None:
+            jams_path = JAMS_FILE_200
+        else:
+            pass
+        
+        if batch_size < 1:
+            raise ValueError('batch_size debe ser mayor que cero.')
+        
+        with self.metrics.stage('parse'):
+            annotations = load_annotations(jams_path, rank, world_size, epoch, self.seed)
+        X_buf, Y_buf = self._allocate(batch_size, dtype)
+        
+        k = 0
+        for ann in annotations:
+            with self.metrics.stage('render'):
+                mix_audio, stem_list = self.render(ann)
+            with self.metrics.stage('stack'):
+                self._write_sample(X_buf, Y_buf, k, mix_audio, stem_list)
+            k += 1
             
-            mixtures.append(normalize_track(mix_audio).T)
-
-            stem = []
-            for stem_audio in stem_list:
-                stem.append(normalize_track(stem_audio))
-                
-            stems.append(np.array(stem).T)
-            os.remove(os.path.join(TEMP_PATH,'temp.jams'))    # Quita el archivo .jams
-
-        X = np.array(mixtures)
-        Y = np.array(stems)
-        shutil.rmtree(TEMP_PATH)
+            if k == batch_size:
+                yield X_buf, Y_buf
+                k = 0
+        
+        if k:
+            yield X_buf[:k], Y_buf[:k]
+    
+    def iter_buckets(self, jams_path: str | None = None, batch_size: int = 32, n_buckets: int = 8, shuffle: bool = True, epoch: int = 0, dtype = 'float32', rank: int = 0, world_size: int = 1):
+        """Modo de largo variable (ver audiomancy.bucketing). Cada mezcla
+        se reconstruye solo hasta el final de su último evento, y los lotes
+        juntan mezclas de largos parecidos, rellenadas hasta el largo de su
+        cubo en lugar de hasta duration.
+        
+        Args:
+            jams_path (str, optional): Ubicación del archivo .jams o de su
+            índice .npz. Por defecto, JAMS_FILE_200.
+            batch_size (int, optional): Mezclas por lote. Por defecto, 32.
+            n_buckets (int, optional): Número de cubos de largo. Por
+            defecto, 8.
+            shuffle (bool, optional): Baraja dentro de cada cubo y el orden
+            de los lotes. Por defecto, True.
+            epoch (int, optional): Época del barajado (con seed). Por
+            defecto, 0.
+            dtype (optional): Tipo de dato de los buffers. Por defecto,
+            'float32'.
+            rank, world_size (optional): Reparto entre nodos, como en
+            read_from_jams.
+        
+        Yields:
+            X_batch: Array (batch, canales, L_cubo).
+            Y_batch: Array (batch, canales, L_cubo, pistas separadas (6)).
+            lengths: Largo real (muestras) de cada mezcla del lote.
+            Los buffers de cada cubo se reutilizan entre lotes.
+        """
+        from .bucketing import mix_lengths, BucketBatchSampler, BucketCollator
+        from .constants import JAMS_FILE_200
+        
+        if jams_path is None:
+            jams_path = JAMS_FILE_200
+        else:
+            pass
+        
+        with self.metrics.stage('parse'):
+            annotations = load_annotations(jams_path, rank, world_size)
+            lengths = mix_lengths(annotations, self.sr, self.duration)
+        
+        sampler = BucketBatchSampler(lengths, batch_size, n_buckets, shuffle, self.seed, drop_last=False)
+        sampler.set_epoch(epoch)
+        collate = BucketCollator(sampler.bucket_lengths, batch_size, self.n_channels, dtype)
         
-        return X, Y
\ No newline at end of file
+        for batch in sampler:
+            samples = []
+            for i in batch:
+                with self.metrics.stage('render'):
+                    samples.append(self.render(annotations[i], duration=lengths[i] / self.sr))
+            with self.metrics.stage('stack'):
+                batch = collate(samples)
+            yield batch     # Fuera de la etapa: la pausa del consumidor no cuenta.
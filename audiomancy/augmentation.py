@@ -0,0 +1,123 @@
+"""Aumentación barata a partir de pistas ya reconstruidas.
+
+read_from_jams devuelve, junto a cada mezcla X, sus seis pistas Y. En
+lugar de volver a sintetizar con scaper/SoX para obtener mezclas nuevas,
+aquí se remezclan esas pistas: a cada una se le sortea un SNR nuevo
+respecto de ref_db (con el mismo rango que generate_random), un
+desplazamiento circular y un cambio de polaridad, y la mezcla se vuelve
+a sumar. Si la nueva mezcla satura, mezcla y pistas se reescalan por el
+mismo factor, igual que fix_clipping.
+
+    X, Y = mixer.read_from_jams(dtype='float32')
+    X_aug, Y_aug = remix(X, Y, k=4, seed=0)          # 4 mezclas nuevas por ejemplo
+
+    for X_batch, Y_batch in augment_batches(mixer.iter_from_jams(), k=3):
+        ...                                          # original y 3 remezclas, mismos buffers
+
+El nivel de cada pista se estima como -0.691 + 10·log10(media de y²),
+la fórmula de BS.1770 sin filtro K ni compuertas: basta para repartir
+los SNR y no requiere una pasada de loudness.
+"""
+import numpy as np
+np.float_ = np.float64
+np.Inf = np.inf
+
+def _levels(Y):
+    """Nivel (dB) de cada pista de Y (n, canales, L, pistas) -> (n, pistas)."""
+    energy = np.einsum('icls,icls->is', Y, Y, dtype='float64') / (Y.shape[1] * Y.shape[2])
+    with np.errstate(divide='ignore'):
+        return -0.691 + 10 * np.log10(energy)
+
+def remix_(X, Y, snr: tuple = (-5, 5), ref_db: float = -20, shift: bool = True, flip: bool = True, fix_clipping: bool = True, rng = None):
+    """Remezcla en el lugar un lote: sobrescribe Y con las pistas
+    reescaladas, desplazadas e invertidas, y X con su nueva suma.
+
+    Args:
+        X: Mezclas (n, canales, L). Se sobrescribe.
+        Y: Pistas (n, canales, L, pistas). Se sobrescribe.
+        snr (tuple, optional): Rango de SNR (dB) de cada pista respecto de
+        ref_db. Por defecto, (-5, 5).
+        ref_db (float, optional): Volumen de referencia (dB). Por
+        defecto, -20.
+        shift (bool, optional): Desplaza cada pista circularmente una
+        cantidad aleatoria de muestras. Por defecto, True.
+        flip (bool, optional): Invierte la polaridad de cada pista con
+        probabilidad 1/2. Por defecto, True.
+        fix_clipping (bool, optional): Reescala mezcla y pistas si la
+        mezcla satura. Por defecto, True.
+        rng (optional): np.random.Generator o semilla.
+
+    Returns:
+        X, Y: Los mismos arrays, ya modificados.
+    """
+    rng = np.random.default_rng(rng)
+    n, _, length, n_stems = Y.shape
+
+    levels = _levels(Y)
+    gains = 10 ** ((ref_db + rng.uniform(snr[0], snr[1], size=(n, n_stems)) - levels) / 20)
+    gains[~np.isfinite(gains)] = 0     # Pistas en silencio.
+    if flip:
+        gains *= rng.choice([-1.0, 1.0], size=(n, n_stems))
+
+    shifts = rng.integers(0, length, size=(n, n_stems)) if shift else np.zeros((n, n_stems), dtype=int)
+    scratch = np.empty(Y.shape[1:3], dtype=Y.dtype)
+
+    for i in range(n):
+        for s in range(n_stems):
+            k, gain = int(shifts[i, s]), Y.dtype.type(gains[i, s])
+            if k == 0:
+                Y[i, :, :, s] *= gain
+                continue
+
+            scratch[:] = Y[i, :, :, s]
+            np.multiply(scratch[:, :length - k], gain, out=Y[i, :, k:, s])
+            np.multiply(scratch[:, length - k:], gain, out=Y[i, :, :k, s])
+
+    Y.sum(axis=-1, out=X)
+
+    if fix_clipping:
+        peaks = np.abs(X).max(axis=(1, 2))
+        scale = np.where(peaks > 1, 1.0 / (peaks + 1e-10), 1.0).astype(X.dtype)
+        X *= scale[:, None, None]
+        Y *= scale[:, None, None, None]
+
+    return X, Y
+
+def remix(X, Y, k: int = 1, snr: tuple = (-5, 5), ref_db: float = -20, shift: bool = True, flip: bool = True, fix_clipping: bool = True, seed = None):
+    """Genera k remezclas nuevas por ejemplo, sin tocar X ni Y.
+
+    Returns:
+        X_aug: Array (n·k, canales, L). Las filas [j·n, (j+1)·n) son la
+        remezcla j de todos los ejemplos.
+        Y_aug: Array (n·k, canales, L, pistas).
+    """
+    rng = np.random.default_rng(seed)
+    n = X.shape[0]
+
+    X_aug = np.empty((n * k,) + X.shape[1:], dtype=X.dtype)
+    Y_aug = np.empty((n * k,) + Y.shape[1:], dtype=Y.dtype)
+
+    for j in range(k):
+        Y_aug[j * n:(j + 1) * n] = Y
+        remix_(X_aug[j * n:(j + 1) * n], Y_aug[j * n:(j + 1) * n], snr, ref_db, shift, flip, fix_clipping, rng)
+
+    return X_aug, Y_aug
+
+def augment_batches(batches, k: int = 1, snr: tuple = (-5, 5), ref_db: float = -20, shift: bool = True, flip: bool = True, fix_clipping: bool = True, seed = None):
+    """Por cada lote (X, Y) de batches entrega el original y luego k
+    remezclas. Las remezclas se escriben en un par de buffers que se
+    reutilizan: copiarlos si se necesita conservar un lote.
+    """
+    rng = np.random.default_rng(seed)
+    X_buf = Y_buf = None
+
+    for X, Y in batches:
+        yield X, Y
+
+        if X_buf is None or X_buf.shape[0] < X.shape[0] or X_buf.shape[1:] != X.shape[1:]:
+            X_buf, Y_buf = np.empty_like(X), np.empty_like(Y)
+
+        X_out, Y_out = X_buf[:X.shape[0]], Y_buf[:Y.shape[0]]
+        for _ in range(k):
+            Y_out[:] = Y
+            yield remix_(X_out, Y_out, snr, ref_db, shift, flip, fix_clipping, rng)
@@ -0,0 +1,186 @@
+"""Modo de largo variable: lotes agrupados por largo.
+
+read_from_jams e iter_from_jams rellenan cada mezcla hasta duration
+(220500 muestras a 44100 Hz y 5 segundos), aunque muchas anotaciones
+terminan bastante antes: el último evento acaba en event_time +
+event_duration·time_stretch. Aquí cada mezcla conserva su largo real:
+
+- mix_lengths calcula ese largo (en muestras) para cada anotación, sin
+  reconstruir audio.
+- BucketBatchSampler reparte las mezclas en cubos de largos parecidos
+  (por cuantiles) y arma los lotes dentro de cada cubo, de modo que el
+  relleno de un lote es a lo más el ancho de su cubo.
+- BucketCollator escribe las mezclas de un lote en un par de buffers
+  reservados una sola vez por cubo, con el largo máximo del cubo.
+
+    sampler = BucketBatchSampler(mix_lengths(annotations, sr), batch_size=32)
+    for X_batch, Y_batch, lengths in mixer.iter_buckets(batch_size=32):
+        ...   # X_batch (b, canales, L_cubo), lengths (b,)
+
+BucketBatchSampler entrega listas de índices, así que también sirve
+como batch_sampler de un DataLoader de PyTorch.
+"""
+import numpy as np
+np.float_ = np.float64
+np.Inf = np.inf
+
+def _end_times(events: list, duration: float):
+    return [min(event.get('event_time', 0) + event['event_duration'] * (event.get('time_stretch') or 1.0), duration) for event in events]
+
+def mix_lengths(annotations, sr: int = 44100, duration: float = 5.0):
+    """Largo real (muestras) de cada mezcla: hasta el final de su último
+    evento, sin pasar de duration.
+
+    Args:
+        annotations: Secuencia de mezclas (ver common.jamsio.load_annotations).
+        sr (int, optional): Frecuencia de muestreo (hercios). Por defecto, 44100.
+        duration (float, optional): Duración máxima (segundos). Por defecto, 5.0.
+
+    Returns:
+        Array de enteros (n,).
+    """
+    from .common.jamsio import SoundscapeIndex
+
+    if isinstance(annotations, SoundscapeIndex):
+        # Directo sobre las columnas, sin armar los diccionarios.
+        events = annotations.events
+        stretch = np.where(np.isnan(events['time_stretch']), 1.0, events['time_stretch'])
+        ends = np.minimum(events['event_time'] + events['event_duration'] * stretch, duration)
+        lengths = np.zeros(len(annotations))
+        filled = annotations.offsets[:-1] < annotations.offsets[1:]
+        lengths[filled] = np.maximum.reduceat(ends, annotations.offsets[:-1][filled])
+    else:
+        from .rendering import events_from_annotation
+
+        lengths = np.array([
+            max(_end_times(ann if isinstance(ann, list) else events_from_annotation(ann), duration), default=0)
+            for ann in annotations
+        ])
+
+    return np.maximum(np.round(lengths * sr).astype(int), 1)
+
+class BucketBatchSampler:
+    """Lotes de índices con mezclas de largos parecidos."""
+    def __init__(self, lengths, batch_size: int = 32, n_buckets: int = 8, shuffle: bool = True, seed: int = 0, drop_last: bool = False):
+        """
+        Args:
+            lengths: Largo (muestras) de cada mezcla, como el de mix_lengths.
+            batch_size (int, optional): Mezclas por lote. Por defecto, 32.
+            n_buckets (int, optional): Número de cubos. Los límites salen de
+            los cuantiles de lengths. Por defecto, 8.
+            shuffle (bool, optional): Baraja las mezclas de cada cubo y el
+            orden de los lotes en cada época. Por defecto, True.
+            seed (int, optional): Semilla del barajado. Por defecto, 0.
+            drop_last (bool, optional): Descarta el último lote incompleto
+            de cada cubo. Por defecto, False.
+        """
+        if batch_size < 1:
+            raise ValueError('batch_size debe ser mayor que cero.')
+
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.drop_last = drop_last
+        self.epoch = 0
+
+        edges = np.unique(np.ceil(np.quantile(self.lengths, np.linspace(0, 1, n_buckets + 1)[1:])).astype(int)) if len(self.lengths) else np.zeros(0, dtype=int)
+        self.bucket = np.searchsorted(edges, self.lengths, side='left')
+        self.bucket_lengths = edges     # Largo con relleno de cada cubo.
+
+    def set_epoch(self, epoch: int):
+        """Cambia el barajado (mismo nombre que en DistributedSampler)."""
+        self.epoch = epoch
+
+    def _batches(self) -> list:
+        rng = np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(self.epoch,)))
+        batches = []
+
+        for b in range(len(self.bucket_lengths)):
+            members = np.flatnonzero(self.bucket == b)
+            if self.shuffle:
+                members = rng.permutation(members)
+            else:
+                pass
+
+            for start in range(0, len(members), self.batch_size):
+                batch = members[start:start + self.batch_size]
+                if len(batch) == self.batch_size or not self.drop_last:
+                    batches.append(batch.tolist())
+
+        if self.shuffle:
+            batches = [batches[k] for k in rng.permutation(len(batches))]
+        else:
+            pass
+
+        return batches
+
+    def __iter__(self):
+        yield from self._batches()
+
+    def __len__(self):
+        counts = np.bincount(self.bucket, minlength=len(self.bucket_lengths))
+        if self.drop_last:
+            return int((counts // self.batch_size).sum())
+        else:
+            return int((-(-counts // self.batch_size)).sum())
+
+    def padding(self) -> dict:
+        """Fracción de muestras de relleno en una época con cubos
+        ('bucketed') y rellenando todo hasta el largo máximo ('fixed').
+        """
+        padded = sum(len(batch) * int(self.bucket_lengths[self.bucket[batch[0]]]) for batch in self._batches())
+        fixed = len(self.lengths) * int(self.lengths.max(initial=0))
+        return {'bucketed': float(1 - self.lengths.sum() / max(padded, 1)), 'fixed': float(1 - self.lengths.sum() / max(fixed, 1))}
+
+class BucketCollator:
+    """Junta mezclas reconstruidas en un par de buffers por cubo. Los
+    buffers se reservan la primera vez que se usa cada cubo y se
+    reutilizan: copiar el lote si se necesita conservarlo.
+    """
+    def __init__(self, bucket_lengths, batch_size: int, n_channels: int = 1, dtype: str = 'float32'):
+        """
+        Args:
+            bucket_lengths: Largo (muestras) de cada cubo, en orden creciente
+            (BucketBatchSampler.bucket_lengths).
+            batch_size (int): Mezclas por lote.
+            n_channels (int, optional): Canales. Por defecto, 1.
+            dtype (str, optional): Tipo de dato de los buffers. Por defecto,
+            'float32'.
+        """
+        self.bucket_lengths = np.asarray(bucket_lengths)
+        self.batch_size = batch_size
+        self.n_channels = n_channels
+        self.dtype = dtype
+        self.buffers = {}
+
+    def __call__(self, samples: list):
+        """
+        Args:
+            samples (list): Pares (mix_audio, stem_list) de cacophony.render.
+
+        Returns:
+            X_batch: Array (b, canales, L_cubo).
+            Y_batch: Array (b, canales, L_cubo, 6).
+            lengths: Largo real de cada mezcla (b,).
+        """
+        from .audioprocessing import cacophony
+        from .constants import LABELS
+
+        lengths = np.array([mix_audio.shape[0] for mix_audio, _ in samples])
+        b = min(int(np.searchsorted(self.bucket_lengths, lengths.max(), side='left')), len(self.bucket_lengths) - 1)
+        length = int(self.bucket_lengths[b])
+
+        if b not in self.buffers:
+            self.buffers[b] = (
+                np.zeros((self.batch_size, self.n_channels, length), dtype=self.dtype),
+                np.zeros((self.batch_size, self.n_channels, length, len(LABELS)), dtype=self.dtype)
+            )
+        else:
+            pass
+
+        X, Y = self.buffers[b]
+        for i, (mix_audio, stem_list) in enumerate(samples):
+            cacophony._write_sample(X, Y, i, mix_audio, stem_list)
+
+        return X[:len(samples)], Y[:len(samples)], np.minimum(lengths, length)
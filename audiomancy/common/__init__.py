@@ -41,12 +41,16 @@ Actualmente tiene {free/(2**10 * 2**10 * 2**10)} GB en el disco.
         else:
             pass
     
-def download_datasets():
+def download_datasets(workers: int = 8):
     """
     Descarga las pistas de audio sin alterar de los datasets originales.
     Pesan cerca de 72 GB.
     
     Solo descárguelo si quiere evaluar los tracks desde sus fuentes originales.
+    
+    Args:
+        workers (int, optional): Conexiones en paralelo por descarga. Por
+        defecto, 8.
     """
     synthSOD_url = 'https://zenodo.org/record/13759492/files/SynthSOD.zip?download=1'
     musdb18hq_url = 'https://zenodo.org/record/3338373/files/musdb18hq.zip?download=1'
@@ -72,7 +76,7 @@ Actualmente tiene {free/(2**10 * 2**10 * 2**10)} GB en el disco.
 ¿Desea continuar? [y/n]:""")
         
         if op=='y':
-            from .utils import download_file, untar_file, unzip_file
+            from .utils import download_file, stream_untar, unzip_file
             import re
             from ..constants import DATASETS_PATH
             
@@ -83,31 +87,56 @@ Actualmente tiene {free/(2**10 * 2**10 * 2**10)} GB en el disco.
                 f = filename.findall(dataset)[0]
                 path = os.path.join(DATASETS_PATH,f)
                 
-                print(f'\nDescargando {f}')
-                download_file(dataset,f)
-                print(f'\nDescomprimiendo {f}')
                 if 'zip' in f:
+                    # Un .zip solo se puede abrir completo: se descarga en
+                    # paralelo por rangos (retomable) y luego se descomprime.
+                    print(f'\nDescargando {f}')
+                    download_file(dataset,path,workers=workers)
+                    print(f'\nDescomprimiendo {f}')
                     unzip_file(path,os.path.join(DATASETS_PATH,f.split('.')[0].lower()))
                 elif 'tar.gz' in f:
-                    untar_file(path,os.path.join(DATASETS_PATH,f.split('.')[0].lower()))
+                    # Un .tar.gz se descomprime mientras llega.
+                    print(f'\nDescargando y descomprimiendo {f}')
+                    stream_untar(dataset,os.path.join(DATASETS_PATH,f.split('.')[0].lower()),strip=f.split('.')[0])
                     
                 print(f'Descargas y descompresiones completadas. Puede encontrar los archivos en {DATASETS_PATH}.')
         else:
             pass
 
-def read_from_jams(jams_path: int | str = 200):
+def read_from_jams(jams_path: int | str = 200, batch_size: int | None = None, dtype = None, workers: int = 1, shards_path: str | None = None, rank: int = 0, world_size: int = 1, epoch: int | None = None, max_memory: int | None = None):
     """Función de atajo para recuperar al toque los tensores X e Y. Se asume que ya se tienen 
     jams files creados cuando se coloca un integer.
 
     Args:
         jams_path (int | str, optional): Ruta al archivo .jams completo si es un string; número
         de muestras si es un integer. Por defecto, 200.
+        batch_size (int, optional): Si se indica, en lugar de los tensores completos se
+        devuelve un generador de lotes (X_batch, Y_batch) con buffers reutilizables
+        (ver cacophony.iter_from_jams). Por defecto, None.
+        dtype (optional): Tipo de dato de los tensores. Por defecto, 'float64' para los
+        tensores completos y 'float32' para los lotes.
+        workers (int, optional): Procesos para reconstruir las mezclas en paralelo. Por
+        defecto, 1.
+        shards_path (str, optional): Carpeta de exportación pre-renderizada. La primera
+        vez se renderiza ahí en fragmentos .npy (retomando si se interrumpió); luego solo
+        se abren con memmap. Devuelve un ShardedArrays (ver common.shards). Con
+        world_size > 1, cada nodo usa su subcarpeta rank<rank>of<world_size>.
+        rank (int, optional): Nodo actual en entrenamiento distribuido. Por defecto, 0.
+        world_size (int, optional): Número de nodos. Cada uno lee y reconstruye solo su
+        parte del archivo, y entre todos cubren cada mezcla una vez. Por defecto, 1.
+        epoch (int, optional): Rebaraja las mezclas antes de repartirlas, distinto en cada
+        época e igual en todos los nodos. No se combina con shards_path. Por defecto, None.
+        max_memory (int, optional): Presupuesto de memoria (bytes) para X e Y. Si el tamaño
+        estimado lo supera, se devuelven como np.memmap en TEMP_PATH (ver
+        cacophony.read_from_jams). Por defecto, None.
 
     Returns:
         X: Array del mix con todas las frecuencias unidas. Dimensiones:
             (n_files, marco 1D (1), frecuencias)
         Y: Array del mix con todas las frecuencias separadas. Dimensiones:
             (n_files, marco 1D (1), frecuencias, pistas separadas (6))
+        Si se da batch_size, un generador de pares (X_batch, Y_batch).
+        Si se da shards_path, un ShardedArrays con los fragmentos mapeados en memoria.
     """
     
     from ..audioprocessing import cacophony
@@ -126,6 +155,23 @@ def read_from_jams(jams_path: int | str = 200):
         raise AssertionError('Tipo de argumento no válido.')
     
     mixer = cacophony()
-    X, Y = mixer.read_from_jams(jams_path)
+    
+    if shards_path is not None:
+        from .shards import export_shards, load_shards
+        
+        if epoch is not None:
+            raise ValueError('Una exportación en shards_path es fija: no se puede rebarajar por época.')
+        
+        export_shards(jams_path, shards_path, dtype=dtype or 'float32', workers=workers, mixer=mixer, rank=rank, world_size=world_size)
+        return load_shards(shards_path, rank, world_size)
+    else:
+        pass
+    
+    if batch_size is not None:
+        return mixer.iter_from_jams(jams_path, batch_size=batch_size, dtype=dtype or 'float32', rank=rank, world_size=world_size, epoch=epoch)
+    else:
+        pass
+    
+    X, Y = mixer.read_from_jams(jams_path, dtype=dtype or 'float64', workers=workers, rank=rank, world_size=world_size, epoch=epoch, max_memory=max_memory)
     
     return X, Y
\ No newline at end of file
@@ -0,0 +1,371 @@
+"""
+Formato columnar para las anotaciones 'scaper' de los archivos .jams.
+
+Los .jams son JSON con sangría: para leer una sola mezcla hay que parsear
+el archivo completo con jams.load. Aquí se guardan los mismos eventos en
+un .npz con un array estructurado (una fila por evento), los offsets de
+cada mezcla y una tabla de strings para los source_file. Cargar el índice
+es leer unos pocos arrays binarios, y la mezcla i se obtiene rebanando
+sus filas sin tocar las demás.
+
+    events[offsets[i]:offsets[i+1]]  ->  eventos de la mezcla i
+
+También está JamsWriter, que escribe las anotaciones a medida que se
+producen (en .jams o en .jsonl, una por línea) sin juntarlas en memoria.
+"""
+
+import numpy as np
+np.float_ = np.float64
+np.Inf = np.inf
+import jams
+import json
+import os
+from tqdm import tqdm
+
+EVENT_DTYPE = np.dtype([
+    ('label', 'i2'),
+    ('source', 'i4'),
+    ('source_time', 'f8'),
+    ('event_time', 'f8'),
+    ('event_duration', 'f8'),
+    ('snr', 'f8'),
+    ('pitch_shift', 'f8'),
+    ('time_stretch', 'f8'),
+    ('role', 'i1')
+])
+
+ROLES = ['foreground', 'background']
+
+def _nan_to_none(value: float):
+    return None if np.isnan(value) else float(value)
+
+class SoundscapeIndex:
+    """Índice columnar de solo lectura. Se comporta como una secuencia
+    de mezclas: len(index), index[i] (jams.Annotation, con la duración y
+    el fix_clipping de la mezcla) e index[a:b].
+    """
+    def __init__(self, index_path: str):
+        """Abre un índice .npz. Las columnas se leen una sola vez al
+        abrir; ningún evento se convierte a diccionario hasta pedirlo.
+
+        Args:
+            index_path (str): Ubicación del archivo .npz.
+        """
+        self.index_path = index_path
+
+        with np.load(index_path, allow_pickle=False) as npz:
+            self.events = npz['events']
+            self.offsets = npz['offsets']
+            self.sources = npz['sources']
+            self.labels = npz['labels']
+            self.durations = npz['durations']
+            self.fix_clipping = npz['fix_clipping']
+
+    def __len__(self):
+        return self.offsets.shape[0] - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.annotation(j) for j in range(*i.indices(len(self)))]
+        else:
+            pass
+
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f'Mezcla fuera de rango: {i}.')
+
+        return self.annotation(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.annotation(i)
+
+    def mix(self, i: int) -> list:
+        """Eventos de la mezcla i como lista de diccionarios con las mismas
+        llaves que las observaciones de scaper. No incluye los ajustes de
+        la mezcla (duración y fix_clipping); para eso, annotation.
+        """
+        rows = self.events[self.offsets[i]:self.offsets[i + 1]]
+
+        return [{
+            'label': str(self.labels[row['label']]),
+            'source_file': str(self.sources[row['source']]),
+            'source_time': float(row['source_time']),
+            'event_time': float(row['event_time']),
+            'event_duration': float(row['event_duration']),
+            'snr': float(row['snr']),
+            'role': ROLES[row['role']],
+            'pitch_shift': _nan_to_none(row['pitch_shift']),
+            'time_stretch': _nan_to_none(row['time_stretch'])
+        } for row in rows]
+
+    def annotation(self, i: int):
+        """Reconstruye la mezcla i como jams.Annotation del namespace 'scaper'."""
+        ann = jams.Annotation(namespace='scaper', time=0, duration=float(self.durations[i]))
+
+        for event in self.mix(i):
+            stretch = event['time_stretch'] or 1.0
+            ann.append(
+                time=event['event_time'],
+                duration=min(event['event_duration'] * stretch, float(self.durations[i]) - event['event_time']),
+                value=event,
+                confidence=1.0
+            )
+
+        ann.sandbox.update(scaper={
+            'duration': float(self.durations[i]),
+            'original_duration': float(self.durations[i]),
+            'fix_clipping': bool(self.fix_clipping[i])
+        })
+
+        return ann
+
+def jams_to_index(jams_path: str, index_path: str):
+    """Convierte las anotaciones 'scaper' de un .jams al índice columnar.
+
+    Args:
+        jams_path (str): Archivo .jams de origen.
+        index_path (str): Archivo .npz de destino.
+    """
+    from ..constants import LABELS
+
+    labels = list(LABELS.keys())
+    sources = {}
+    rows = []
+    offsets = [0]
+    durations = []
+    fix_clipping = []
+
+    for ann in tqdm(jams.load(jams_path, strict=False).search(namespace='scaper')):
+        for obs in ann.data:
+            value = obs.value
+
+            if value['label'] not in labels:
+                labels.append(value['label'])
+
+            rows.append((
+                labels.index(value['label']),
+                sources.setdefault(value['source_file'], len(sources)),
+                value['source_time'],
+                value.get('event_time', 0),
+                value['event_duration'],
+                value['snr'],
+                np.nan if value.get('pitch_shift') is None else value['pitch_shift'],
+                np.nan if value.get('time_stretch') is None else value['time_stretch'],
+                ROLES.index(value.get('role', 'foreground'))
+            ))
+
+        sandbox = getattr(ann.sandbox, 'scaper', None) or {}
+        offsets.append(len(rows))
+        durations.append(ann.duration if ann.duration is not None else sandbox.get('duration', 5.0))
+        fix_clipping.append(sandbox.get('fix_clipping', True))
+
+    np.savez(
+        index_path,
+        events=np.array(rows, dtype=EVENT_DTYPE),
+        offsets=np.array(offsets, dtype='int64'),
+        sources=np.array(list(sources.keys()), dtype=str),
+        labels=np.array(labels, dtype=str),
+        durations=np.array(durations, dtype='float64'),
+        fix_clipping=np.array(fix_clipping, dtype=bool)
+    )
+
+def index_to_jams(index_path: str, jams_path: str):
+    """Convierte un índice columnar de vuelta a .jams (compatible con
+    jams.load(..., strict=False)).
+
+    Args:
+        index_path (str): Archivo .npz de origen.
+        jams_path (str): Archivo .jams de destino.
+    """
+    index = SoundscapeIndex(index_path)
+    jam = jams.JAMS()
+
+    for i in tqdm(range(len(index))):
+        jam.annotations.append(index.annotation(i))
+
+    jam.save(jams_path, strict=False)
+
+def shard_indices(n: int, rank: int = 0, world_size: int = 1, epoch: int | None = None, seed: int = 0):
+    """Índices de las mezclas que le tocan a un nodo.
+
+    Las n mezclas se reparten en world_size partes disjuntas que cubren
+    todo el archivo y cuyos tamaños difieren a lo más en uno. Sin epoch,
+    al nodo rank le tocan rank, rank + world_size, ...; con epoch, se
+    hace lo mismo sobre una permutación que sale de (seed, epoch), igual
+    en todos los nodos, así que cada época reparte distinto pero sin
+    solapamientos.
+
+    Args:
+        n (int): Número de mezclas.
+        rank (int, optional): Nodo actual, en [0, world_size). Por defecto, 0.
+        world_size (int, optional): Número de nodos. Por defecto, 1.
+        epoch (int, optional): Época para rebarajar. Por defecto, None
+        (orden del archivo).
+        seed (int, optional): Semilla del rebarajado. Por defecto, 0.
+
+    Returns:
+        Array de índices en el archivo, en el orden en que se procesan.
+    """
+    if world_size < 1 or not 0 <= rank < world_size:
+        raise ValueError(f'rank debe estar en [0, world_size): rank={rank}, world_size={world_size}.')
+
+    if epoch is None:
+        order = np.arange(n)
+    else:
+        order = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(epoch,))).permutation(n)
+
+    return order[rank::world_size]
+
+class AnnotationShard:
+    """Parte de una secuencia de mezclas que le toca a un nodo (ver
+    shard_indices). shard[i] es la mezcla indices[i] del archivo.
+    """
+    def __init__(self, annotations, indices):
+        """
+        Args:
+            annotations: Secuencia de mezclas, o diccionario índice ->
+            mezcla con al menos las de indices.
+            indices: Índices en el archivo de las mezclas de esta parte.
+        """
+        self.annotations = annotations
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.annotations[int(j)] for j in self.indices[i]]
+        else:
+            return self.annotations[int(self.indices[i])]
+
+    def __iter__(self):
+        for j in self.indices:
+            yield self.annotations[int(j)]
+
+def load_annotations(jams_path: str, rank: int = 0, world_size: int = 1, epoch: int | None = None, seed: int = 0):
+    """Secuencia de mezclas de un .jams, de un índice .npz o de un .jsonl
+    de JamsWriter. Con los dos últimos, cada mezcla se arma recién cuando
+    se pide.
+
+    Con world_size > 1 o epoch, devuelve un AnnotationShard con solo la
+    parte de rank (ver shard_indices). Desde .npz y .jsonl no se parsean
+    las demás mezclas; un .jams se parsea completo, pero solo se conservan
+    las anotaciones propias.
+    """
+    if jams_path.endswith('.npz'):
+        annotations = SoundscapeIndex(jams_path)
+    elif jams_path.endswith('.jsonl'):
+        annotations = JsonlAnnotations(jams_path)
+    else:
+        annotations = jams.load(jams_path, strict=False).annotations
+
+    if world_size == 1 and epoch is None:
+        return annotations
+    else:
+        pass
+
+    indices = shard_indices(len(annotations), rank, world_size, epoch, seed)
+    if isinstance(annotations, (SoundscapeIndex, JsonlAnnotations)):
+        return AnnotationShard(annotations, indices)
+    else:
+        return AnnotationShard({int(j): annotations[int(j)] for j in indices}, indices)
+
+class JamsWriter:
+    """Escritor incremental de anotaciones.
+
+    En lugar de juntar todas las anotaciones en un jams.JAMS en memoria y
+    guardarlo al final, cada anotación se serializa y se escribe apenas
+    se produce, así que la memoria no crece con la cantidad de mixes.
+
+    Con extensión .jams se escribe un JAMS normal (legible con
+    jams.load(..., strict=False)); con .jsonl, una anotación por línea.
+    Se escribe a un .tmp que reemplaza al destino recién al cerrar.
+
+        with JamsWriter('soundscapes.jams') as writer:
+            for ann in annotations:
+                writer.write(ann)
+    """
+    def __init__(self, path: str):
+        """Abre el archivo de destino.
+
+        Args:
+            path (str): Archivo .jams o .jsonl de destino.
+        """
+        self.path = path
+        self.jsonl = path.endswith('.jsonl')
+        self.count = 0
+        self._tmp = path + '.tmp'
+        self._file = open(self._tmp, 'w', encoding='utf-8')
+
+        if not self.jsonl:
+            self._file.write('{\n  "annotations": [\n')
+
+    def write(self, ann):
+        """Escribe una anotación (jams.Annotation o diccionario ya serializado)."""
+        data = ann.__json__ if isinstance(ann, jams.Annotation) else ann
+
+        if self.jsonl:
+            self._file.write(json.dumps(data) + '\n')
+        else:
+            self._file.write((',\n' if self.count else '') + json.dumps(data, indent=2))
+
+        self.count += 1
+
+    def close(self):
+        """Cierra el JSON y reemplaza el destino."""
+        if not self.jsonl:
+            tail = jams.JAMS().__json__
+            tail.pop('annotations')
+            self._file.write('\n  ],\n' + json.dumps(tail, indent=2)[1:].lstrip('\n'))
+
+        self._file.close()
+        os.replace(self._tmp, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            os.remove(self._tmp)
+
+class JsonlAnnotations:
+    """Secuencia de mezclas de un .jsonl escrito por JamsWriter. Al abrir
+    solo se registran los offsets de cada línea; cada mezcla se parsea
+    recién al pedirla y se entrega como jams.Annotation, con la duración
+    y el sandbox (fix_clipping) con que se escribió.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.offsets = []
+
+        with open(path, 'rb') as f:
+            offset = 0
+            for line in f:
+                if line.strip():
+                    self.offsets.append(offset)
+                offset += len(line)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        else:
+            pass
+
+        with open(self.path, 'rb') as f:
+            f.seek(self.offsets[i])
+            data = json.loads(f.readline())
+
+        return jams.Annotation.__json_init__(**data)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
@@ -0,0 +1,182 @@
+"""
+Exportación de un .jams a tensores pre-renderizados en fragmentos .npy.
+
+Cada entrenamiento que llama a read_from_jams vuelve a sintetizar todo el
+audio. Con export_shards se renderiza una sola vez a disco:
+
+    shards/
+      +----- manifest.json
+      +----- X_00000.npy   (mezclas, (n, canales, L))
+      +----- Y_00000.npy   (pistas, (n, canales, L, 6))
+      +----- X_00001.npy
+     ...
+
+Los fragmentos se abren luego con np.load(mmap_mode='r'): el arranque es
+inmediato y los procesos de un mismo nodo comparten la caché de páginas.
+Cada fragmento se escribe como .tmp y se renombra al terminar, y el
+manifiesto registra los completos, de modo que una exportación
+interrumpida se retoma desde el primer fragmento pendiente.
+
+Con world_size > 1, cada nodo exporta su parte en una subcarpeta propia
+(shards/rank0of4, shards/rank1of4, ...), así que todos pueden recibir la
+misma shards_path en un sistema de archivos compartido.
+"""
+
+import numpy as np
+np.float_ = np.float64
+np.Inf = np.inf
+import json
+import os
+
+MANIFEST = 'manifest.json'
+
+def _write_manifest(shards_path: str, manifest: dict):
+    tmp = os.path.join(shards_path, MANIFEST + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(shards_path, MANIFEST))
+
+def _read_manifest(shards_path: str) -> dict | None:
+    path = os.path.join(shards_path, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def rank_path(shards_path: str, rank: int = 0, world_size: int = 1) -> str:
+    """Carpeta de la parte de rank dentro de shards_path. Con un solo
+    nodo, la misma shards_path.
+    """
+    if world_size > 1:
+        return os.path.join(shards_path, f'rank{rank}of{world_size}')
+    else:
+        return shards_path
+
+def export_shards(jams_path: str, shards_path: str, shard_size: int = 256, dtype: str = 'float32', workers: int = 1, mixer = None, rank: int = 0, world_size: int = 1) -> dict:
+    """Renderiza un .jams (o su índice .npz) a fragmentos .npy con manifiesto.
+    Si el manifiesto ya existe, se saltan los fragmentos completos.
+
+    Args:
+        jams_path (str): Archivo .jams o índice .npz.
+        shards_path (str): Carpeta de salida (la misma en todos los nodos).
+        shard_size (int, optional): Mezclas por fragmento. Por defecto, 256.
+        dtype (str, optional): Tipo de dato almacenado ('float32' o
+        'float16'). Por defecto, 'float32'.
+        workers (int, optional): Procesos para renderizar cada fragmento.
+        mixer (cacophony, optional): Mezclador configurado (motor, almacén
+        de stems, etc.). Por defecto, cacophony().
+        rank (int, optional): Nodo actual. Por defecto, 0.
+        world_size (int, optional): Número de nodos. Cada uno exporta solo
+        su parte del archivo (ver jamsio.shard_indices) en su propia
+        subcarpeta (ver rank_path). Por defecto, 1.
+
+    Returns:
+        dict: Manifiesto de la exportación.
+    """
+    from ..audioprocessing import cacophony
+    from .jamsio import load_annotations
+
+    if mixer is None:
+        mixer = cacophony()
+    else:
+        pass
+
+    annotations = load_annotations(jams_path, rank, world_size)
+    n = len(annotations)
+    source = {
+        'jams_path': os.path.abspath(jams_path),
+        'jams_size': os.path.getsize(jams_path),
+        'n': n,
+        'shard_size': shard_size,
+        'dtype': np.dtype(dtype).name,
+        'sr': mixer.sr,
+        'duration': mixer.duration,
+        'n_channels': mixer.n_channels
+    }
+    if world_size > 1:
+        source.update(rank=rank, world_size=world_size)
+    else:
+        pass
+
+    shards_path = rank_path(shards_path, rank, world_size)
+    os.makedirs(shards_path, exist_ok=True)
+    manifest = _read_manifest(shards_path)
+
+    if manifest is None:
+        manifest = dict(source, shards=[])
+    elif any(manifest[key] != value for key, value in source.items()):
+        raise ValueError(f'La carpeta {shards_path} contiene una exportación con otra configuración. Use otra carpeta o bórrela.')
+    else:
+        pass
+
+    done = {shard['index'] for shard in manifest['shards']}
+
+    for k, start in enumerate(range(0, n, shard_size)):
+        x_file, y_file = f'X_{k:05d}.npy', f'Y_{k:05d}.npy'
+
+        if k in done and os.path.exists(os.path.join(shards_path, x_file)) and os.path.exists(os.path.join(shards_path, y_file)):
+            continue
+
+        chunk = annotations[start:start + shard_size]
+        shape_X, shape_Y = mixer._shapes(len(chunk))
+        X = np.lib.format.open_memmap(os.path.join(shards_path, x_file + '.tmp'), mode='w+', dtype=dtype, shape=shape_X)
+        Y = np.lib.format.open_memmap(os.path.join(shards_path, y_file + '.tmp'), mode='w+', dtype=dtype, shape=shape_Y)
+
+        print(f'Fragmento {k + 1}/{-(-n // shard_size)}')
+        if workers > 1:
+            mixer._render_parallel(chunk, X, Y, workers)
+        else:
+            for i, ann in enumerate(chunk):
+                mix_audio, stem_list = mixer.render(ann)
+                mixer._write_sample(X, Y, i, mix_audio, stem_list)
+
+        X.flush()
+        Y.flush()
+        del X, Y
+        os.replace(os.path.join(shards_path, x_file + '.tmp'), os.path.join(shards_path, x_file))
+        os.replace(os.path.join(shards_path, y_file + '.tmp'), os.path.join(shards_path, y_file))
+
+        manifest['shards'] = [shard for shard in manifest['shards'] if shard['index'] != k]
+        manifest['shards'].append({'index': k, 'start': start, 'count': len(chunk), 'X': x_file, 'Y': y_file})
+        manifest['shards'].sort(key=lambda shard: shard['index'])
+        _write_manifest(shards_path, manifest)
+
+    return manifest
+
+class ShardedArrays:
+    """Vista sobre los fragmentos exportados, abiertos con
+    np.load(mmap_mode='r'). dataset[i] devuelve (X[i], Y[i]) sin copiar.
+    """
+    def __init__(self, shards_path: str):
+        """Abre una exportación completa.
+
+        Args:
+            shards_path (str): Carpeta con manifest.json.
+        """
+        manifest = _read_manifest(shards_path)
+
+        if manifest is None:
+            raise FileNotFoundError(f'No se encontró {MANIFEST} en {shards_path}.')
+        if sum(shard['count'] for shard in manifest['shards']) != manifest['n']:
+            raise ValueError(f'La exportación en {shards_path} está incompleta. Vuelva a correr export_shards para retomarla.')
+
+        self.manifest = manifest
+        self.X = [np.load(os.path.join(shards_path, shard['X']), mmap_mode='r') for shard in manifest['shards']]
+        self.Y = [np.load(os.path.join(shards_path, shard['Y']), mmap_mode='r') for shard in manifest['shards']]
+        self.starts = np.array([shard['start'] for shard in manifest['shards']])
+
+    def __len__(self):
+        return self.manifest['n']
+
+    def __getitem__(self, i: int):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f'Mezcla fuera de rango: {i}.')
+
+        k = int(np.searchsorted(self.starts, i, side='right')) - 1
+        return self.X[k][i - self.starts[k]], self.Y[k][i - self.starts[k]]
+
+def load_shards(shards_path: str, rank: int = 0, world_size: int = 1) -> ShardedArrays:
+    """Abre la parte de rank de una exportación hecha con export_shards."""
+    return ShardedArrays(rank_path(shards_path, rank, world_size))
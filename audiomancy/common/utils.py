@@ -5,32 +5,282 @@ Módulo adicional para descargar y descomprimir archivos.
 import requests
 import zipfile
 import tarfile
+import hashlib
+import json
 import os
 import shutil
-from mega import Mega
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 
-def download_file(url: str, destination: str):
+def _session(workers: int = 8):
+    """Sesión con un pool de conexiones del tamaño de los hilos y
+    reintentos ante errores transitorios del servidor.
+    """
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(total=5, backoff_factor=1, status_forcelist=(429, 500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def _hasher(checksum: str | None):
+    """Devuelve (algoritmo, valor esperado) a partir de 'md5:...' o
+    'sha256:...' (el formato de Zenodo). Sin prefijo se asume md5.
+    """
+    if checksum is None:
+        return None, None
+
+    algorithm, _, expected = checksum.rpartition(':')
+    return hashlib.new(algorithm or 'md5'), expected.lower()
+
+def _verify(path: str, checksum: str | None, block_size: int = 2**22):
+    hasher, expected = _hasher(checksum)
+    if hasher is None:
+        return
+
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            hasher.update(block)
+
+    if hasher.hexdigest() != expected:
+        raise IOError(f'La suma de verificación de {path} no coincide ({hasher.hexdigest()} != {expected}).')
+
+def _probe(session, url: str):
+    """Tamaño final y soporte de rangos, siguiendo las redirecciones."""
+    response = session.head(url, allow_redirects=True, timeout=30)
+    response.raise_for_status()
+    size = int(response.headers.get('content-length', 0)) or None
+    ranges = response.headers.get('accept-ranges', '').lower() == 'bytes'
+    return response.url, size, ranges
+
+def download_file(url: str, destination: str, workers: int = 8, part_size: int = 64 * 2**20, checksum: str | None = None, block_size: int = 2**20):
     """Descarga archivos que sean recuperables mediante requests.
 
+    Si el servidor acepta rangos, el archivo se parte en tramos de
+    part_size que se piden en paralelo sobre una sesión con pool de
+    conexiones, y cada hilo escribe su tramo en su posición de un
+    archivo .part reservado de antemano. Los tramos terminados se anotan
+    en un .part.json: si la descarga se corta, volver a llamar retoma solo
+    los que faltan. Sin rangos, se descarga en un solo flujo (retomando
+    desde el tamaño del .part si el servidor lo permite).
+
     Args:
         url (str): Enlace de descarga.
         destination (str): Path de destino para el archivo descargado.
+        workers (int, optional): Conexiones en paralelo. Por defecto, 8.
+        part_size (int, optional): Bytes por tramo. Por defecto, 64 MiB.
+        checksum (str, optional): 'md5:...' o 'sha256:...'. Si se da, se
+        verifica antes de dejar el archivo en destination.
+        block_size (int, optional): Bytes por lectura. Por defecto, 1 MiB.
     """
-    response = requests.get(url, stream=True)
-    total_size = int(response.headers.get('content-length', 0))
-    block_size = 8192
-    with open(destination, 'wb') as file, tqdm(
-        desc=destination, 
-        total=total_size, 
-        unit='iB', 
-        unit_scale=True, 
-        unit_divisor=1024
-    ) as bar:
-        for chunk in response.iter_content(chunk_size=block_size):
-            if chunk:
-                file.write(chunk)
-                bar.update(len(chunk))
+    if os.path.exists(destination):
+        _verify(destination, checksum)
+        return destination
+    else:
+        pass
+
+    session = _session(workers)
+    url, size, ranges = _probe(session, url)
+    part_path, state_path = destination + '.part', destination + '.part.json'
+
+    if ranges and size:
+        parts = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+        done = set()
+
+        if os.path.exists(part_path) and os.path.exists(state_path):
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state['url'] == url and state['size'] == size and state['part_size'] == part_size:
+                done = set(state['done'])
+        else:
+            pass
+
+        if not done:
+            with open(part_path, 'wb') as f:
+                f.truncate(size)
+
+        lock = threading.Lock()
+
+        def save_state():
+            with open(state_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({'url': url, 'size': size, 'part_size': part_size, 'done': sorted(done)}, f)
+            os.replace(state_path + '.tmp', state_path)
+
+        def fetch(k: int):
+            start, end = parts[k]
+            response = session.get(url, headers={'Range': f'bytes={start}-{end}'}, stream=True, timeout=60)
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise IOError(f'El servidor ignoró el rango pedido para {url}.')
+
+            with open(part_path, 'r+b') as f:
+                f.seek(start)
+                for chunk in response.iter_content(chunk_size=block_size):
+                    f.write(chunk)
+                    bar.update(len(chunk))
+
+            with lock:
+                done.add(k)
+                save_state()
+
+        pending = [k for k in range(len(parts)) if k not in done]
+        with tqdm(
+            desc=os.path.basename(destination),
+            total=size,
+            initial=size - sum(parts[k][1] - parts[k][0] + 1 for k in pending),
+            unit='iB',
+            unit_scale=True,
+            unit_divisor=1024
+        ) as bar, ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(fetch, k) for k in pending]:
+                future.result()
+    else:
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) and ranges else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        response = session.get(url, headers=headers, stream=True, timeout=60)
+        response.raise_for_status()
+        if offset and response.status_code != 206:
+            offset = 0
+
+        with open(part_path, 'ab' if offset else 'wb') as file, tqdm(
+            desc=os.path.basename(destination),
+            total=size,
+            initial=offset,
+            unit='iB',
+            unit_scale=True,
+            unit_divisor=1024
+        ) as bar:
+            for chunk in response.iter_content(chunk_size=block_size):
+                if chunk:
+                    file.write(chunk)
+                    bar.update(len(chunk))
+
+    try:
+        _verify(part_path, checksum)
+    except IOError:
+        # Un archivo corrupto no sirve para retomar: se empieza de cero.
+        os.remove(part_path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        raise
+
+    os.replace(part_path, destination)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+
+    return destination
+
+class _HashingReader:
+    """Envuelve el flujo de la respuesta para ir calculando la suma de
+    verificación y el progreso mientras tarfile lo consume.
+    """
+    def __init__(self, raw, hasher, bar):
+        self.raw = raw
+        self.hasher = hasher
+        self.bar = bar
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.raw.read(size)
+        if self.hasher is not None:
+            self.hasher.update(data)
+        self.bar.update(len(data))
+        return data
+
+def _strip_member(name: str, prefix: str | None) -> str | None:
+    """Quita la carpeta inicial prefix de la ruta de un miembro. Devuelve
+    None para la carpeta misma.
+    """
+    if prefix is None:
+        return name
+
+    parts = name.split('/', 1)
+    if parts[0] != prefix:
+        return name
+    return parts[1] if len(parts) > 1 and parts[1] else None
+
+def _member_filter(members):
+    """Convierte el filtro de miembros en una función sobre la ruta: None
+    (todos), una función, o una colección de nombres de archivo (p. ej.
+    {'vocals.wav', 'drums.wav', 'bass.wav'}).
+    """
+    if members is None or callable(members):
+        return members
+
+    names = set(members)
+    return lambda name: name.rsplit('/', 1)[-1] in names
+
+def _target(extract_to: str, name: str) -> str:
+    """Ruta final de un miembro. Rechaza rutas que salgan de extract_to."""
+    root = os.path.abspath(extract_to)
+    target = os.path.abspath(os.path.join(root, *[part for part in name.split('/') if part]))
+    if os.path.commonpath([root, target]) != root:
+        raise ValueError(f'El miembro {name} quedaría fuera de {extract_to}.')
+    return target
+
+def _extract_tar_stream(tar_ref, extract_to: str, strip: str | None, keep = None):
+    """Extrae un tar abierto en modo flujo ('r|*'), miembro por miembro
+    y directamente a su ruta final, sin la carpeta inicial strip.
+    """
+    for member in tar_ref:
+        name = _strip_member(member.name, strip)
+        if name is None:
+            continue
+        if member.isfile() and keep is not None and not keep(name):
+            continue
+
+        member.name = name
+        if member.islnk():
+            member.linkname = _strip_member(member.linkname, strip) or member.linkname
+
+        if hasattr(tarfile, 'data_filter'):
+            tar_ref.extract(member, extract_to, filter='data')
+        else:
+            _target(extract_to, name)
+            tar_ref.extract(member, extract_to)
+
+def stream_untar(url: str, extract_to: str, checksum: str | None = None, strip: str | None = None, members = None, block_size: int = 2**20):
+    """Descarga un .tar.gz y lo descomprime mientras llega, sin guardar
+    el archivo comprimido: cada miembro se escribe directamente en su
+    ruta final apenas termina de llegar.
+
+    Un flujo gzip no se puede retomar a la mitad: si se corta, vuelve a
+    empezar. Para archivos donde importa retomar, usar download_file y
+    luego untar_file.
+
+    Args:
+        url (str): Enlace de descarga.
+        extract_to (str): Destino final.
+        checksum (str, optional): 'md5:...' o 'sha256:...' del archivo
+        comprimido; se verifica al terminar el flujo.
+        strip (str, optional): Carpeta inicial que se omite al extraer
+        (la que tiene el nombre del archivo). Por defecto, ninguna.
+        members (optional): Filtro de archivos (ver unzip_file).
+        block_size (int, optional): Bytes por lectura del flujo.
+    """
+    session = _session(1)
+    response = session.get(url, stream=True, timeout=60)
+    response.raise_for_status()
+    response.raw.decode_content = True
+
+    hasher, expected = _hasher(checksum)
+    os.makedirs(extract_to, exist_ok=True)
+
+    with tqdm(desc=os.path.basename(extract_to), total=int(response.headers.get('content-length', 0)) or None, unit='iB', unit_scale=True, unit_divisor=1024) as bar:
+        reader = _HashingReader(response.raw, hasher, bar)
+
+        with tarfile.open(fileobj=reader, mode='r|gz', bufsize=block_size) as tar_ref:
+            _extract_tar_stream(tar_ref, extract_to, strip, _member_filter(members))
+
+        while reader.read(block_size):  # Relleno final del tar, para la suma.
+            pass
+
+    if hasher is not None and hasher.hexdigest() != expected:
+        raise IOError(f'La suma de verificación de {url} no coincide ({hasher.hexdigest()} != {expected}).')
 
 def download_mega(url: str, destination: str):
     """Descarga archivos de MEGA.
@@ -39,6 +289,8 @@ def download_mega(url: str, destination: str):
         url (str): Enlace de descarga.
         destination (str): Path de destino para el archivo descargado.
     """
+    from mega import Mega
+
     mega = Mega()
     m = mega.login() 
     file = m.find(url)
@@ -58,50 +310,81 @@ def download_mega(url: str, destination: str):
             f.write(chunk)
             bar.update(len(chunk))
 
-def unzip_file(zip_path: str, extract_to: str):
+def unzip_file(zip_path: str, extract_to: str, members = None, workers: int = 8):
     """Descomprime archivos .zip. Si el nombre del archivo es igual
     a la primera carpeta interna, esta se vuelve la principal.
 
+    La carpeta inicial se quita de cada ruta al vuelo y cada miembro se
+    escribe directamente en su ruta final (sin carpeta temporal ni
+    movimientos posteriores). Los miembros se descomprimen en paralelo
+    con un pool de hilos, cada uno con su propio manejador del .zip.
+
     Args:
         zip_path (str): Ubicación del archivo .zip.
         extract_to (str): Destino final.
+        members (optional): Filtro de archivos: una función que recibe la
+        ruta (ya sin la carpeta inicial) o una colección de nombres, p. ej.
+        {'vocals.wav', 'drums.wav', 'bass.wav'}. Por defecto, todos.
+        workers (int, optional): Hilos de descompresión. Por defecto, 8.
     """
+    keep = _member_filter(members)
+    local = threading.local()
+    handles = []
+
     with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_content = zip_ref.namelist()
-
-        first_folder = zip_content[0].split('/')[0]
-        zip_name = os.path.splitext(os.path.basename(zip_path))[0]
-
-        if first_folder == zip_name:
-            temp_extract_path = os.path.join(extract_to, 'temp_extract')
-            zip_ref.extractall(temp_extract_path)
-            source_path = os.path.join(temp_extract_path, first_folder)
-            for file_name in os.listdir(source_path):
-                shutil.move(os.path.join(source_path, file_name), extract_to)
-            shutil.rmtree(temp_extract_path)
-        else:
-            zip_ref.extractall(extract_to)
+        infos = zip_ref.infolist()
+
+    first_folder = infos[0].filename.split('/')[0] if infos else None
+    zip_name = os.path.splitext(os.path.basename(zip_path))[0]
+    strip = first_folder if first_folder == zip_name else None
 
-def untar_file(tar_path: str, extract_to: str):
+    files = []
+    for info in infos:
+        name = _strip_member(info.filename.rstrip('/'), strip)
+        if name is None:
+            continue
+
+        target = _target(extract_to, name)
+        if info.is_dir():
+            os.makedirs(target, exist_ok=True)
+        elif keep is None or keep(name):
+            files.append((info, target))
+
+    def extract(item):
+        info, target = item
+        if not hasattr(local, 'zip_ref'):
+            local.zip_ref = zipfile.ZipFile(zip_path, 'r')
+            handles.append(local.zip_ref)
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with local.zip_ref.open(info) as src, open(target, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 2**20)
+        return info.file_size
+
+    with tqdm(desc=os.path.basename(zip_path), total=sum(info.file_size for info, _ in files), unit='iB', unit_scale=True, unit_divisor=1024) as bar:
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for size in pool.map(extract, files):
+                    bar.update(size)
+        finally:
+            for handle in handles:
+                handle.close()
+
+def untar_file(tar_path: str, extract_to: str, members = None):
     """Descomprime archivos .tar.gz. Si el nombre del archivo es igual
     a la primera carpeta interna, esta se vuelve la principal.
 
+    Se lee en una sola pasada en modo flujo: la carpeta inicial se quita
+    al vuelo y cada miembro se escribe directamente en su ruta final. Un
+    gzip no se puede descomprimir en paralelo.
+
     Args:
-        tar_path (str): Ubicación del archivo .zip.
+        tar_path (str): Ubicación del archivo .tar.gz.
         extract_to (str): Destino final.
+        members (optional): Filtro de archivos (ver unzip_file).
     """
-    with tarfile.open(tar_path, 'r:gz') as tar_ref:
-        tar_content = tar_ref.getnames()
-
-        first_folder = tar_content[0].split('/')[0]
-        tar_name = os.path.splitext(os.path.splitext(os.path.basename(tar_path))[0])[0]
-
-        if first_folder == tar_name:
-            temp_extract_path = os.path.join(extract_to, 'temp_extract')
-            tar_ref.extractall(temp_extract_path)
-            source_path = os.path.join(temp_extract_path, first_folder)
-            for file_name in os.listdir(source_path):
-                shutil.move(os.path.join(source_path, file_name), extract_to)
-            shutil.rmtree(temp_extract_path)
-        else:
-            tar_ref.extractall(extract_to)
\ No newline at end of file
+    tar_name = os.path.splitext(os.path.splitext(os.path.basename(tar_path))[0])[0]
+    os.makedirs(extract_to, exist_ok=True)
+
+    with tarfile.open(tar_path, 'r|gz') as tar_ref:
+        _extract_tar_stream(tar_ref, extract_to, tar_name, _member_filter(members))
@@ -11,10 +11,14 @@ ABSOLUTE_PATH = os.path.join(os.path.dirname(__file__))
 DATASETS_PATH = os.path.join(ABSOLUTE_PATH,'common','datasets')
 STEMS_PATH = os.path.join(ABSOLUTE_PATH,'common','stems')
 TEMP_PATH = os.path.join(ABSOLUTE_PATH,'common','temp')
+STORE_PATH = os.path.join(ABSOLUTE_PATH,'common','store')
+FEATURES_PATH = os.path.join(ABSOLUTE_PATH,'common','features')
+EVENT_CACHE_PATH = os.path.join(ABSOLUTE_PATH,'common','eventcache')
 
 JAMS_FILE_200 = os.path.join(ABSOLUTE_PATH,'common','200_soundscapes.jams')
 JAMS_FILE_1000 = os.path.join(ABSOLUTE_PATH,'common','1000_soundscapes.jams')
 STEM_METADATA = os.path.join(ABSOLUTE_PATH,'common','metadata.json')
+STEM_INDEX = os.path.join(ABSOLUTE_PATH,'common','stemindex.npz')
 
 LABELS = {
     'accoustic':0,
@@ -0,0 +1,245 @@
+"""Dataset infinito de mezclas aleatorias, sin pasar por un .jams.
+
+generate_random describe n mezclas en un .jams que después se
+reconstruye con read_from_jams. Para entrenar a gran escala conviene
+sortear una mezcla nueva en cada paso: RandomMixDataset sortea los
+eventos con los mismos rangos de generate_random y los reconstruye con
+cacophony.render en un pool de procesos que trabaja por adelantado.
+
+    mixer = cacophony(engine='numpy')
+    mixer.compile_stems()
+    dataset = RandomMixDataset(mixer, workers=4, shuffle_buffer=256, spec_log='specs.jsonl')
+
+    for x, y in dataset:            # x: (canales, L), y: (canales, L, 6)
+        ...
+
+    for X, Y in dataset.batches(16):
+        ...
+
+La secuencia es determinista dada la semilla del mezclador y worker_id:
+la mezcla i se sortea con su propia semilla, derivada de (seed,
+worker_id, i), y el buffer de mezcla tiene otra semilla aparte, así que
+no depende de cuántos procesos se usen ni de cuál termine primero. Con
+varios procesos de carga (por ejemplo, los de un DataLoader), cada uno
+debe usar un worker_id distinto.
+
+Con spec_log, cada mezcla entregada se anota en un .jsonl (worker_id,
+índice y eventos); replay vuelve a producir exactamente esas mezclas.
+"""
+import numpy as np
+np.float_ = np.float64
+np.Inf = np.inf
+import json
+import multiprocessing
+import soundfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+_worker = {}
+"""Mezclador de cada proceso de carga."""
+
+def _init_worker(mixer):
+    _worker['mixer'] = mixer
+
+def _render_sample(mixer, events: list, dtype: str):
+    """Reconstruye una mezcla y la entrega como (x, y) con las mismas
+    dimensiones que una fila de read_from_jams.
+    """
+    mix_audio, stem_list = mixer.render(events)
+    X, Y = mixer._allocate(1, dtype)
+    mixer._write_sample(X, Y, 0, mix_audio, stem_list)
+    return X[0], Y[0]
+
+def _render_in_worker(events: list, dtype: str):
+    return _render_sample(_worker['mixer'], events, dtype)
+
+class RandomMixDataset:
+    """Iterable infinito de mezclas (x, y) sorteadas al vuelo."""
+    def __init__(self, mixer, snr: tuple = (-5, 5), pitch_shift: tuple = (-2, 2), time_stretch: tuple = (0.8, 1.2), source_time: tuple = (0, 7), workers: int = 2, prefetch: int = 32, shuffle_buffer: int = 0, worker_id: int = 0, spec_log: str | None = None, dtype: str = 'float32'):
+        """
+        Args:
+            mixer (cacophony): Mezclador con duración, frecuencia de
+            muestreo, canales, ref_db, semilla, motor y, si se compiló,
+            almacén de stems. Si tiene índice de stems (index_stems), los
+            eventos se sortean con él, dentro de regiones activas.
+            snr (tuple, optional): Rango de SNR (dB). Por defecto, (-5, 5).
+            pitch_shift (tuple, optional): Rango de variación de tono. Por
+            defecto, (-2, 2).
+            time_stretch (tuple, optional): Rango de extensión de tiempo.
+            Por defecto, (0.8, 1.2).
+            source_time (tuple, optional): Rango del inicio de la ventana
+            en el stem (segundos), acotado a los inicios que caben en cada
+            stem. Por defecto, (0, 7).
+            workers (int, optional): Procesos que reconstruyen por
+            adelantado. Con 0, o dentro de un proceso daemon (como los de
+            un DataLoader de PyTorch, que no pueden tener hijos), se
+            reconstruye en el mismo proceso. Por defecto, 2.
+            prefetch (int, optional): Máximo de mezclas en curso o listas
+            sin entregar (cola acotada). Por defecto, 32.
+            shuffle_buffer (int, optional): Tamaño del buffer de mezcla.
+            Con 0, las mezclas salen en orden. Por defecto, 0.
+            worker_id (int, optional): Identificador de este proceso de
+            carga, para que cada uno produzca una secuencia distinta. Por
+            defecto, 0.
+            spec_log (str, optional): Archivo .jsonl donde anotar los
+            eventos de cada mezcla entregada. Por defecto, ninguno.
+            dtype (str, optional): Tipo de dato de x e y. Por defecto,
+            'float32'.
+        """
+        from .constants import LABELS
+
+        self.mixer = mixer
+        self.snr = snr
+        self.pitch_shift = pitch_shift
+        self.time_stretch = time_stretch
+        self.source_time = source_time
+        self.workers = workers
+        self.prefetch = max(1, prefetch)
+        self.shuffle_buffer = shuffle_buffer
+        self.worker_id = worker_id
+        self.spec_log = spec_log
+        self.dtype = dtype
+        self.labels = list(LABELS.keys())
+        self.sources = self._sources() if mixer.stem_index is None else None
+
+        missing = [label for label in self.labels if self.sources is not None and not self.sources.get(label)]
+        if missing:
+            raise FileNotFoundError(f'No hay stems para: {", ".join(missing)} (en {mixer.fg_path}).')
+
+    def _sources(self) -> dict:
+        """Stems disponibles por label con su duración (segundos). Con el
+        almacén compilado se toman de su índice; si no, se leen las
+        cabeceras de los .wav una sola vez.
+        """
+        from .stemstore import _scan
+
+        sources = {label: [] for label in self.labels}
+        store = self.mixer.store
+
+        if store is not None:
+            for key, entry in sorted(store.index['files'].items()):
+                label = key.split('/')[0]
+                if label in sources:
+                    sources[label].append((key, entry['length'] / store.sr))
+        else:
+            for key, info in _scan(self.mixer.fg_path).items():
+                sources[key.split('/')[0]].append((key, soundfile.info(info['path']).duration))
+
+        return sources
+
+    def spec(self, index: int) -> list:
+        """Eventos de la mezcla index, con las mismas reglas que scaper
+        en generate_random: event_duration se acorta para que el evento
+        estirado quepa en la mezcla y para no pasarse del stem, y
+        source_time se sortea solo entre los inicios cuya ventana cabe en
+        el archivo (como en StemIndex.sample_events).
+        """
+        rng = np.random.default_rng(np.random.SeedSequence(self.mixer.seed, spawn_key=(self.worker_id, 0, index)))
+        duration = self.mixer.duration
+
+        if self.mixer.stem_index is not None:
+            return self.mixer.stem_index.sample_events(rng, self.labels, duration, self.snr, self.pitch_shift, self.time_stretch)
+        else:
+            pass
+        events = []
+
+        for label in self.labels:
+            source_file, source_duration = self.sources[label][rng.integers(len(self.sources[label]))]
+            stretch = float(rng.uniform(*self.time_stretch))
+
+            event_duration = min(duration, duration / stretch, source_duration)
+            latest = min(self.source_time[1], source_duration - event_duration)
+            source_time = float(rng.uniform(min(self.source_time[0], latest), latest))
+
+            events.append({
+                'label': label,
+                'source_file': source_file,
+                'source_time': source_time,
+                'event_time': 0,
+                'event_duration': event_duration,
+                'snr': float(rng.uniform(*self.snr)),
+                'role': 'foreground',
+                'pitch_shift': float(rng.uniform(*self.pitch_shift)),
+                'time_stretch': stretch
+            })
+
+        return events
+
+    def _ordered(self, start: int):
+        """Mezclas en orden de índice, reconstruidas por adelantado. Como
+        mucho hay prefetch en curso: se encarga una nueva recién cuando se
+        entrega la más antigua.
+        """
+        index = start
+
+        if self.workers < 1 or multiprocessing.current_process().daemon:
+            while True:
+                events = self.spec(index)
+                yield index, events, _render_sample(self.mixer, events, self.dtype)
+                index += 1
+        else:
+            pass
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self.mixer,)) as pool:
+            pending = deque()
+            try:
+                while True:
+                    while len(pending) < self.prefetch:
+                        events = self.spec(index)
+                        pending.append((index, events, pool.submit(_render_in_worker, events, self.dtype)))
+                        index += 1
+
+                    i, events, future = pending.popleft()
+                    yield i, events, future.result()
+            finally:
+                for _, _, future in pending:
+                    future.cancel()
+
+    def samples(self, start: int = 0):
+        """Genera (índice, eventos, (x, y)) sin fin, pasando por el
+        buffer de mezcla. start permite retomar la secuencia.
+        """
+        ordered = self._ordered(start)
+
+        if self.shuffle_buffer < 2:
+            yield from ordered
+            return
+
+        rng = np.random.default_rng(np.random.SeedSequence(self.mixer.seed, spawn_key=(self.worker_id, 1, start)))
+        buffer = [next(ordered) for _ in range(self.shuffle_buffer)]
+
+        for item in ordered:
+            j = int(rng.integers(len(buffer)))
+            yield buffer[j]
+            buffer[j] = item
+
+    def __iter__(self):
+        log = open(self.spec_log, 'a', encoding='utf-8') if self.spec_log is not None else None
+
+        try:
+            for index, events, sample in self.samples():
+                if log is not None:
+                    log.write(json.dumps({'worker_id': self.worker_id, 'index': index, 'events': events}) + '\n')
+                    log.flush()
+                yield sample
+        finally:
+            if log is not None:
+                log.close()
+
+    def batches(self, batch_size: int):
+        """Agrupa las mezclas en lotes (X, Y) de batch_size."""
+        samples = iter(self)
+
+        while True:
+            batch = [next(samples) for _ in range(batch_size)]
+            yield np.stack([x for x, _ in batch]), np.stack([y for _, y in batch])
+
+    def replay(self, spec_log: str | None = None):
+        """Vuelve a reconstruir, en el mismo orden, las mezclas anotadas
+        en un spec_log de este worker_id.
+        """
+        with open(spec_log or self.spec_log, 'r', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry['worker_id'] == self.worker_id:
+                    yield _render_sample(self.mixer, entry['events'], self.dtype)
@@ -0,0 +1,203 @@
+"""Procesamiento de señal en NumPy para el motor nativo de mezcla.
+
+Reemplaza los procesos externos de SoX (pitch y tempo) que scaper
+lanza por cada evento. El pitch shift y el time stretch se resuelven
+con un único phase vocoder vectorizado seguido de un remuestreo con
+soxr (la biblioteca de remuestreo que ya usa librosa, en proceso). El
+resto de la cadena de scaper también se replica aquí: fades de cuarto
+de seno, loudness integrada (LUFS) con pyloudnorm y normalización por
+pico cuando la mezcla satura. loudness_blocks y gated_lufs permiten
+precalcular la loudness de los stems (ver audiomancy.stemindex).
+"""
+import numpy as np
+np.float_ = np.float64
+np.Inf = np.inf
+import pyloudnorm
+import soxr
+
+WINDOWS = {
+    'hann': lambda n: np.hanning(n + 1)[:-1],
+    'hamming': lambda n: np.hamming(n + 1)[:-1],
+    'boxcar': np.ones
+}
+
+def _window(window: str, n_fft: int):
+    if window not in WINDOWS:
+        raise ValueError(f"Ventana no válida: {window}. Usar {', '.join(WINDOWS)}.")
+    return WINDOWS[window](n_fft)
+
+def n_frames(length: int, n_fft: int = 2048, hop: int = 512) -> int:
+    """Cantidad de frames de stft para una señal de length muestras."""
+    return 1 + (max(length + 2 * (n_fft // 2), n_fft) - n_fft) // hop
+
+def stft(x, n_fft: int = 2048, hop: int = 512, window: str = 'hann'):
+    """STFT centrada sobre el último eje. (..., L) -> (..., frames, bins).
+
+    Los bordes se rellenan con ceros, como librosa >= 0.10: con relleno
+    por reflexión, el phase vocoder atenúa la señal completa (un seno de
+    pico 0.92 sale con pico 0.2).
+    """
+    w = _window(window, n_fft)
+    x = np.asarray(x)
+    x = np.pad(x, [(0, 0)] * (x.ndim - 1) + [(n_fft // 2, n_fft // 2)])
+
+    if x.shape[-1] < n_fft:
+        x = np.pad(x, [(0, 0)] * (x.ndim - 1) + [(0, n_fft - x.shape[-1])])
+
+    frames = np.lib.stride_tricks.sliding_window_view(x, n_fft, axis=-1)[..., ::hop, :]
+    return np.fft.rfft(frames * w, axis=-1)
+
+def istft(S, n_fft: int = 2048, hop: int = 512, length: int | None = None, window: str = 'hann'):
+    """Inversa de stft por overlap-add. (..., frames, bins) -> (..., L).
+    Como n_fft es múltiplo de hop, la suma se hace en n_fft // hop
+    pasadas vectorizadas en lugar de un bucle por frame.
+    """
+    if n_fft % hop:
+        raise ValueError('n_fft debe ser múltiplo de hop.')
+
+    w = _window(window, n_fft)
+    frames = np.fft.irfft(S, n=n_fft, axis=-1) * w
+    count = frames.shape[-2]
+    ratio = n_fft // hop
+
+    y = np.zeros(frames.shape[:-2] + ((count + ratio - 1) * hop,))
+    norm = np.zeros(((count + ratio - 1) * hop,))
+    segments = y.reshape(y.shape[:-1] + (-1, hop))
+    norm_segments = norm.reshape(-1, hop)
+    window_sq = (w ** 2).reshape(ratio, hop)
+
+    for j in range(ratio):
+        segments[..., j:j + count, :] += frames[..., j * hop:(j + 1) * hop]
+        norm_segments[j:j + count] += window_sq[j]
+
+    y /= np.where(norm > 1e-10, norm, 1.0)
+    y = y[..., n_fft // 2:]
+
+    if length is not None:
+        y = y[..., :length] if y.shape[-1] >= length else np.pad(y, [(0, 0)] * (y.ndim - 1) + [(0, length - y.shape[-1])])
+
+    return y
+
+def phase_vocoder(S, rate: float, hop: int = 512):
+    """Estira S (frames, bins) en el tiempo por 1/rate. rate > 1 acorta.
+    Magnitudes interpoladas entre frames vecinos y fase acumulada con
+    cumsum, sin bucle por frame.
+    """
+    n_frames, n_bins = S.shape
+    n_fft = 2 * (n_bins - 1)
+    steps = np.arange(0, n_frames, rate)
+
+    S = np.concatenate([S, np.zeros((2, n_bins), dtype=S.dtype)], axis=0)
+    idx = steps.astype(int)
+    alpha = (steps - idx)[:, None]
+
+    magnitude = (1 - alpha) * np.abs(S[idx]) + alpha * np.abs(S[idx + 1])
+
+    advance = 2 * np.pi * hop * np.arange(n_bins) / n_fft
+    dphase = np.angle(S[idx + 1]) - np.angle(S[idx]) - advance
+    dphase -= 2 * np.pi * np.round(dphase / (2 * np.pi))
+    dphase += advance
+
+    phase = np.angle(S[0]) + np.concatenate([np.zeros((1, n_bins)), np.cumsum(dphase[:-1], axis=0)], axis=0)
+
+    return magnitude * np.exp(1j * phase)
+
+def resample(x, sr_in: float, sr_out: float):
+    """Remuestreo de alta calidad en proceso (soxr)."""
+    if sr_in == sr_out:
+        return x
+    return soxr.resample(x, sr_in, sr_out, quality='HQ')
+
+def pitch_time(x, sr: int, pitch_shift: float | None = None, time_stretch: float | None = None, n_fft: int = 2048, hop: int = 512):
+    """Pitch shift (semitonos) y time stretch (factor de duración, como
+    en scaper: 1.2 alarga un 20 %) en una sola pasada: un phase vocoder
+    y un remuestreo.
+
+    Para subir n semitonos y alargar por ts, se estira por ts * 2^(n/12)
+    y luego se remuestrea por 2^(-n/12), que devuelve la duración ts y
+    sube el tono.
+    """
+    shift = 2.0 ** ((pitch_shift or 0.0) / 12.0)
+    stretch = float(time_stretch or 1.0)
+    out_length = int(round(x.shape[0] * stretch))
+
+    if shift == 1.0 and stretch == 1.0:
+        return x
+
+    y = istft(phase_vocoder(stft(x, n_fft, hop), 1.0 / (stretch * shift), hop), n_fft, hop, length=int(round(x.shape[0] * stretch * shift)))
+
+    if shift != 1.0:
+        y = resample(y, sr * shift, sr)
+
+    return y[:out_length] if y.shape[0] >= out_length else np.pad(y, (0, out_length - y.shape[0]))
+
+def fade(x, sr: int, fade_in_len: float = 0.01, fade_out_len: float = 0.01):
+    """Fades de cuarto de seno sobre el primer eje, con las mismas
+    ventanas que scaper aplica a cada evento ya normalizado.
+    """
+    x = np.array(x, dtype='float64')
+    n_in = min(int(fade_in_len * sr), x.shape[0])
+    n_out = min(int(fade_out_len * sr), x.shape[0])
+
+    if n_in:
+        ramp = np.sin(np.linspace(0, np.pi / 2, n_in))
+        x[:n_in] *= ramp.reshape((-1,) + (1,) * (x.ndim - 1))
+    if n_out:
+        ramp = np.sin(np.linspace(np.pi / 2, 0, n_out))
+        x[x.shape[0] - n_out:] *= ramp.reshape((-1,) + (1,) * (x.ndim - 1))
+
+    return x
+
+def integrated_lufs(audio, sr: int, min_duration: float = 0.5):
+    """Loudness integrada (LUFS, ITU-R BS.1770). Igual que scaper, los
+    audios más cortos que min_duration se repiten hasta alcanzarla.
+    """
+    duration = audio.shape[0] / float(sr)
+    if duration < min_duration:
+        n_tiles = int(np.ceil(min_duration / max(duration, 1e-10)))
+        audio = np.tile(audio, (n_tiles,) + (1,) * (audio.ndim - 1))
+
+    return pyloudnorm.Meter(sr).integrated_loudness(audio)
+
+def peak_normalize(mix_audio, stem_list: list):
+    """Reescala mezcla y pistas por el mismo factor para que el pico de
+    la mezcla quede en 1 (fix_clipping de scaper).
+    """
+    scale_factor = 1.0 / (np.max(np.abs(mix_audio)) + 1e-10)
+    return mix_audio * scale_factor, [stem * scale_factor for stem in stem_list], scale_factor
+
+def loudness_blocks(audio, sr: int, block: float = 0.4, step: float = 0.1):
+    """Energía media (z_j de ITU-R BS.1770) de cada bloque de 400 ms con
+    salto de 100 ms de un audio mono, tras el filtro K de pyloudnorm. Con
+    estos bloques, gated_lufs da la loudness integrada de cualquier
+    ventana alineada a 100 ms sin volver a filtrar el audio.
+    """
+    audio = np.asarray(audio, dtype='float64')
+    for stage in pyloudnorm.Meter(sr)._filters.values():
+        audio = stage.apply_filter(audio)
+
+    size, hop = int(block * sr), int(step * sr)
+    if audio.shape[0] < size:
+        return np.zeros((0,), dtype='float32')
+
+    energy = np.concatenate(([0.0], np.cumsum(audio ** 2)))
+    starts = np.arange(0, audio.shape[0] - size + 1, hop)
+    return ((energy[starts + size] - energy[starts]) / size).astype('float32')
+
+def gated_lufs(z, n_channels: int = 1):
+    """Loudness integrada a partir de los bloques de loudness_blocks, con
+    las compuertas absoluta (-70 LUFS) y relativa (-10 LU) de BS.1770.
+    Un stem mono repetido en n_channels canales (hasta 3, de ganancia 1)
+    suma 10·log10(n_channels).
+    """
+    z = np.asarray(z, dtype='float64')
+    with np.errstate(divide='ignore'):
+        l = -0.691 + 10 * np.log10(z)
+
+    gated = z[l >= -70]
+    if gated.shape[0] == 0:
+        return -np.inf
+
+    relative = -0.691 + 10 * np.log10(gated.mean()) - 10
+    gated = z[(l >= -70) & (l > relative)]
+    return -0.691 + 10 * np.log10(gated.mean() * min(n_channels, 3))
@@ -0,0 +1,65 @@
+"""
+Comprobaciones del entorno para la confección de mezclas.
+
+Antes se hacían al importar el paquete (un subproceso 'sox -h' en cada
+import, también en cada proceso de un DataLoader). Ahora se hacen recién
+cuando se pide la primera mezcla y el resultado queda en caché por
+proceso: las siguientes llamadas no cuestan nada.
+"""
+
+import os
+import shutil
+import warnings
+from functools import lru_cache
+
+@lru_cache(maxsize=None)
+def sox_available() -> bool:
+    """Indica si el programa SoX está en el PATH. No lanza subprocesos."""
+    return shutil.which('sox') is not None
+
+@lru_cache(maxsize=None)
+def check_rendering(fg_path: str, needs_sox: bool = True) -> bool:
+    """Advierte, una sola vez por proceso y por combinación de argumentos,
+    si falta SoX o la carpeta de stems.
+
+    Args:
+        fg_path (str): Carpeta de stems.
+        needs_sox (bool, optional): Si la mezcla pasa por SoX (motor 'sox',
+        con o sin almacén de stems, o síntesis de scaper). Por defecto, True.
+
+    Returns:
+        bool: True si el entorno está completo.
+    """
+    ok = True
+
+    if needs_sox and not sox_available():
+        ok = False
+        warnings.warn("""No se ha encontrado el programa SoX.
+
+    La confección de audios aleatorios mediante .JAMS requiere
+    de este programa, salvo que se use el motor nativo:
+    cacophony(engine='numpy').
+
+    Para descargarlo, proceder acá:
+     - - - http://sox.sourceforge.net/ - - -
+
+    O descárguelo por chocolatey.
+    """)
+
+    if not os.path.exists(fg_path):
+        ok = False
+        warnings.warn("""No se ha encontrado el directorio de stems.
+
+    La confección de audios aleatorios mediante .JAMS requiere
+    de esta carpeta en audiomancy/common.
+
+    Para descargarlo, correr las siguientes líneas de código en
+    su directorio raíz:
+
+    >import audiomancy
+    >audiomancy.common.download_stems()
+
+    O descárguelo directamente desde https://mega.nz/file/eUwHCLCJ#7g4qRZnCxxgnQyY8WzWaWAjg14k_D59FiJRjLyz1MJo
+    """)
+
+    return ok
@@ -0,0 +1,177 @@
+"""Caché en disco de eventos ya transformados.
+
+Un evento de un .jams queda completamente determinado por source_file
+(y su versión: mtime y tamaño del stem), source_time, event_duration,
+pitch_shift, time_stretch y la frecuencia de muestreo (más el motor, los
+fades y los canales con que se mezcla). Si un stem se reescribe (por
+ejemplo, con preprocess_stems), sus eventos cambian de llave.
+Sin embargo, cada vez que aparece en otra época o en otro trabajo se
+vuelve a decodificar y a pasar por SoX. EventCache guarda el resultado
+de esa cadena en un .npy por evento, con nombre igual al hash de esos
+campos:
+
+    common/eventcache/
+      +----- 3f/
+      |       +----- 3fa1...e2.npy   (muestras, canales), float32
+     ...
+
+El audio se guarda ya normalizado a 0 LUFS, así que un acierto se abre
+con memmap y al mezclar solo queda aplicar la ganancia del SNR y sumar.
+Cada acierto actualiza el mtime del archivo; cuando el caché pasa de
+max_bytes se borran los menos usados hasta bajar al 90 %.
+
+Con quantize, pitch_shift y time_stretch se redondean a un paso fijo
+antes de calcular la llave y también antes de transformar, de modo que
+lo guardado corresponde exactamente a los parámetros redondeados y los
+eventos parecidos comparten archivo.
+
+    mixer = cacophony(engine='numpy')
+    mixer.cache_events(max_bytes=20 * 2**30, quantize=(0.05, 0.01))
+    X, Y = mixer.read_from_jams()
+"""
+import numpy as np
+np.float_ = np.float64
+np.Inf = np.inf
+import hashlib
+import json
+import os
+import re
+
+class EventCache:
+    """Caché LRU de eventos transformados, con tope de tamaño en disco."""
+    def __init__(self, cache_path: str | None = None, max_bytes: int = 10 * 2**30, quantize: tuple | None = None):
+        """
+        Args:
+            cache_path (str, optional): Carpeta del caché. Por defecto,
+            EVENT_CACHE_PATH.
+            max_bytes (int, optional): Tamaño máximo en disco. Por defecto,
+            10 GiB.
+            quantize (tuple, optional): Pasos (semitonos, factor) a los que
+            se redondean pitch_shift y time_stretch. Por defecto, None
+            (sin redondear).
+        """
+        from .constants import EVENT_CACHE_PATH
+
+        self.cache_path = cache_path if cache_path is not None else EVENT_CACHE_PATH
+        self.max_bytes = max_bytes
+        self.quantize = quantize
+        self.size = None     # Estimación del tamaño; se mide al primer put.
+        self.hits = self.misses = 0
+
+    def __getstate__(self):
+        """Al pasar a otro proceso solo viaja la configuración."""
+        return {'cache_path': self.cache_path, 'max_bytes': self.max_bytes, 'quantize': self.quantize}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def prepare(self, event: dict) -> dict:
+        """Evento con pitch_shift y time_stretch redondeados según quantize."""
+        if self.quantize is None:
+            return event
+        else:
+            pass
+
+        event = dict(event)
+        for field, step in zip(('pitch_shift', 'time_stretch'), self.quantize):
+            if event.get(field) is not None and step:
+                event[field] = round(round(event[field] / step) * step, 10)
+
+        return event
+
+    def key(self, event: dict, stem: tuple, sr: int, n_channels: int, engine: str, fade_in_len: float, fade_out_len: float, indexed: bool) -> str:
+        """Hash de todo lo que determina el audio del evento ya preparado.
+        stem es (mtime, tamaño) del stem de origen, como en _scan.
+        """
+        parts = [part for part in re.split(r'[\\/]+', event['source_file']) if part]
+        fields = [
+            '/'.join(parts[-2:]),
+            list(stem),
+            float(event['source_time']),
+            float(event['event_duration']),
+            event.get('pitch_shift'),
+            event.get('time_stretch'),
+            sr, n_channels, engine, fade_in_len, fade_out_len, indexed
+        ]
+        return hashlib.sha1(json.dumps(fields).encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_path, key[:2], key + '.npy')
+
+    def get(self, key: str):
+        """Audio normalizado del evento, abierto con memmap, o None."""
+        path = self._path(key)
+
+        try:
+            audio = np.load(path, mmap_mode='r')
+            os.utime(path)
+        except (FileNotFoundError, ValueError):     # Ausente, o borrado/truncado por otro proceso.
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return audio
+
+    def put(self, key: str, audio):
+        """Guarda el audio normalizado de un evento (escritura atómica)."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, np.asarray(audio, dtype='float32'))
+        os.replace(tmp, path)
+
+        if self.size is None:
+            self.size = self._scan()[1]
+        else:
+            self.size += os.path.getsize(path)
+
+        if self.size > self.max_bytes:
+            self.evict()
+        else:
+            pass
+
+    def _scan(self):
+        """Archivos del caché como (mtime, bytes, ruta) y su tamaño total."""
+        entries = []
+        if os.path.isdir(self.cache_path):
+            for folder in os.scandir(self.cache_path):
+                if folder.is_dir():
+                    for entry in os.scandir(folder.path):
+                        if entry.name.endswith('.npy'):
+                            try:
+                                stat = entry.stat()
+                            except FileNotFoundError:
+                                continue
+                            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        return entries, sum(entry[1] for entry in entries)
+
+    def evict(self, target: float = 0.9):
+        """Borra los eventos menos usados hasta bajar a target·max_bytes.
+        Se vuelve a medir la carpeta, porque otros procesos también
+        escriben y borran.
+        """
+        entries, total = self._scan()
+
+        for _, size, path in sorted(entries):
+            if total <= target * self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+        self.size = total
+
+    def clear(self):
+        """Vacía el caché."""
+        for _, _, path in self._scan()[0]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+        self.size = 0
@@ -0,0 +1,229 @@
+"""Caché de espectrogramas (STFT) de mezclas y pistas.
+
+Cada entrenamiento recalcula los espectrogramas de X e Y (las seis
+pistas) a partir de las ondas que devuelve read_from_jams. FeatureCache
+los calcula una sola vez por combinación de .jams y parámetros, y los
+guarda como arrays .npy que luego se abren con memmap:
+
+    common/features/<llave>/
+      +----- meta.json     (parámetros y origen)
+      +----- X.npy         (n, canales, F, T)
+      +----- Y.npy         (n, canales, F, T, 6)
+      +----- done.npy      (mezclas ya calculadas)
+
+La llave es un hash del .jams (ruta, tamaño y mtime), de todo lo que
+cambia el audio reconstruido (hiperparámetros del mezclador, motor,
+almacén de stems o .wav, índice de stems, fades y cuantización del
+caché de eventos) y de los parámetros de la STFT (n_fft, hop, ventana,
+magnitud o complejo y dtype): cambiar cualquiera da otra carpeta. Las
+mezclas que faltan se reconstruyen y transforman en paralelo, y cada
+bloque terminado se marca en done.npy, así que un cálculo interrumpido
+se retoma.
+
+    features = FeatureCache(JAMS_FILE_200, n_fft=2048, hop=512).build(workers=8)
+    X_spec, Y_spec = features.X, features.Y
+    ...
+    Y_audio = masks_to_audio(X, masks, n_fft=2048, hop=512)   # máscaras -> audio
+
+La STFT es la de audiomancy.dsp (la misma del motor nativo); aquí los
+espectrogramas se guardan como (..., F, T).
+"""
+import numpy as np
+np.float_ = np.float64
+np.Inf = np.inf
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+
+from .dsp import _window, n_frames, stft, istft
+from .tiers import n_samples
+
+def _features(X, Y, n_fft: int, hop: int, window: str, mode: str, dtype: str):
+    """Espectrogramas de un bloque: X (n, c, L) e Y (n, c, L, 6)."""
+    X_spec = np.swapaxes(stft(X, n_fft, hop, window), -1, -2)
+    Y_spec = np.moveaxis(stft(np.moveaxis(Y, -1, -2), n_fft, hop, window), -3, -1).swapaxes(-2, -3)
+
+    if mode == 'magnitude':
+        return np.abs(X_spec).astype(dtype), np.abs(Y_spec).astype(dtype)
+    else:
+        complex_dtype = np.result_type(dtype, np.complex64)
+        return X_spec.astype(complex_dtype), Y_spec.astype(complex_dtype)
+
+def masks_to_audio(mix, masks, n_fft: int = 2048, hop: int = 512, window: str = 'hann', length: int | None = None):
+    """Convierte máscaras predichas en audio de cada pista, con la fase
+    de la mezcla.
+
+    Args:
+        mix: Mezcla como onda (..., L) o como STFT compleja (..., F, T).
+        masks: Máscaras (..., F, T, pistas).
+        length (int, optional): Muestras de salida. Por defecto, las de la
+        mezcla si es una onda.
+
+    Returns:
+        Array (..., L, pistas), con la misma disposición que Y.
+    """
+    if np.iscomplexobj(mix):
+        S = mix
+    else:
+        length = length if length is not None else mix.shape[-1]
+        S = np.swapaxes(stft(mix, n_fft, hop, window), -1, -2)
+
+    stems = istft(np.moveaxis(S[..., None] * masks, -1, -3).swapaxes(-1, -2), n_fft, hop, length, window)
+    return np.moveaxis(stems, -2, -1)
+
+def _compute_chunk(job: tuple):
+    """Reconstruye y transforma un bloque de mezclas y lo escribe en su
+    lugar de los .npy del caché. Corre dentro de un proceso del pool.
+    """
+    mixer, cache_path, params, start, annotations = job
+
+    X_spec = np.load(os.path.join(cache_path, 'X.npy'), mmap_mode='r+')
+    Y_spec = np.load(os.path.join(cache_path, 'Y.npy'), mmap_mode='r+')
+    X, Y = mixer._allocate(len(annotations), 'float64')
+
+    for i, ann in enumerate(annotations):
+        mix_audio, stem_list = mixer.render(ann)
+        mixer._write_sample(X, Y, i, mix_audio, stem_list)
+
+    X_spec[start:start + len(annotations)], Y_spec[start:start + len(annotations)] = _features(X, Y, **params)
+    X_spec.flush()
+    Y_spec.flush()
+
+    return start, len(annotations)
+
+class FeatureCache:
+    """Espectrogramas de un .jams guardados en disco y abiertos con memmap."""
+    def __init__(self, jams_path: str | None = None, mixer = None, n_fft: int = 2048, hop: int = 512, window: str = 'hann', mode: str = 'magnitude', dtype: str = 'float32', cache_path: str | None = None):
+        """
+        Args:
+            jams_path (str, optional): Archivo .jams, índice .npz o .jsonl.
+            Por defecto, JAMS_FILE_200.
+            mixer (cacophony, optional): Mezclador que reconstruye las
+            mezclas. Por defecto, cacophony().
+            n_fft (int, optional): Tamaño de la FFT. Por defecto, 2048.
+            hop (int, optional): Salto entre frames. Por defecto, 512.
+            window (str, optional): 'hann', 'hamming' o 'boxcar'. Por
+            defecto, 'hann'.
+            mode (str, optional): 'magnitude' o 'complex'. Por defecto,
+            'magnitude'.
+            dtype (str, optional): 'float32' o 'float64' (complex64 o
+            complex128 con mode='complex'). Por defecto, 'float32'.
+            cache_path (str, optional): Carpeta raíz del caché. Por
+            defecto, FEATURES_PATH.
+        """
+        from .constants import JAMS_FILE_200, FEATURES_PATH
+
+        if mixer is None:
+            from .audioprocessing import cacophony
+            mixer = cacophony()
+        else:
+            pass
+
+        if mode not in ('magnitude', 'complex'):
+            raise ValueError("mode debe ser 'magnitude' o 'complex'.")
+        _window(window, n_fft)
+
+        self.jams_path = jams_path if jams_path is not None else JAMS_FILE_200
+        self.mixer = mixer
+        self.params = {'n_fft': n_fft, 'hop': hop, 'window': window, 'mode': mode, 'dtype': np.dtype(dtype).name}
+
+        from inspect import signature
+        from .rendering import render_events
+
+        # Los fades de cada evento son los de render_events por defecto.
+        defaults = signature(render_events).parameters
+        stat = os.stat(self.jams_path)
+        self.meta = {
+            'jams_path': os.path.abspath(self.jams_path),
+            'jams_size': stat.st_size,
+            'jams_mtime': stat.st_mtime_ns,
+            'sr': mixer.sr,
+            'duration': mixer.duration,
+            'n_channels': mixer.n_channels,
+            'ref_db': mixer.ref_db,
+            'engine': mixer.engine,
+            'store': mixer.store is not None,
+            'stem_index': mixer.stem_index is not None,
+            'fade_in_len': defaults['fade_in_len'].default,
+            'fade_out_len': defaults['fade_out_len'].default,
+            'quantize': mixer.event_cache.quantize if mixer.event_cache is not None else None,
+            **self.params
+        }
+        self.key = hashlib.sha1(json.dumps(self.meta, sort_keys=True).encode()).hexdigest()[:16]
+        self.path = os.path.join(cache_path if cache_path is not None else FEATURES_PATH, self.key)
+        self.X = self.Y = None
+
+    def _shapes(self, n: int):
+        from .constants import LABELS
+
+        bins = self.params['n_fft'] // 2 + 1
+        frames = n_frames(n_samples(self.mixer.duration, self.mixer.sr), self.params['n_fft'], self.params['hop'])
+        return (n, self.mixer.n_channels, bins, frames), (n, self.mixer.n_channels, bins, frames, len(LABELS))
+
+    def build(self, workers: int = 1, chunksize: int = 8):
+        """Calcula las mezclas que faltan en el caché y lo abre.
+
+        Args:
+            workers (int, optional): Procesos en paralelo. Por defecto, 1.
+            chunksize (int, optional): Mezclas por bloque (y por punto de
+            control). Por defecto, 8.
+
+        Returns:
+            FeatureCache: El mismo objeto, con X e Y abiertos.
+        """
+        from .common.jamsio import load_annotations
+
+        annotations = load_annotations(self.jams_path)
+        n = len(annotations)
+        os.makedirs(self.path, exist_ok=True)
+        done_path = os.path.join(self.path, 'done.npy')
+
+        if not os.path.exists(done_path):
+            dtype = self.params['dtype'] if self.params['mode'] == 'magnitude' else np.result_type(self.params['dtype'], np.complex64)
+            shape_X, shape_Y = self._shapes(n)
+            np.lib.format.open_memmap(os.path.join(self.path, 'X.npy'), mode='w+', dtype=dtype, shape=shape_X).flush()
+            np.lib.format.open_memmap(os.path.join(self.path, 'Y.npy'), mode='w+', dtype=dtype, shape=shape_Y).flush()
+            with open(os.path.join(self.path, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(dict(self.meta, n=n), f, indent=2)
+            np.save(done_path, np.zeros(n, dtype=bool))
+        else:
+            pass
+
+        done = np.load(done_path, mmap_mode='r+')
+        jobs = [
+            (self.mixer, self.path, self.params, start, list(annotations[start:start + chunksize]))
+            for start in range(0, n, chunksize)
+            if not done[start:start + chunksize].all()
+        ]
+
+        if jobs:
+            print(f'Calculando espectrogramas de {sum(len(job[-1]) for job in jobs)} mezclas.')
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=workers) as pool, tqdm(total=sum(len(job[-1]) for job in jobs)) as bar:
+                    for start, count in pool.map(_compute_chunk, jobs):
+                        done[start:start + count] = True
+                        done.flush()
+                        bar.update(count)
+            else:
+                for job in tqdm(jobs):
+                    start, count = _compute_chunk(job)
+                    done[start:start + count] = True
+                    done.flush()
+        else:
+            pass
+
+        self.X = np.load(os.path.join(self.path, 'X.npy'), mmap_mode='r')
+        self.Y = np.load(os.path.join(self.path, 'Y.npy'), mmap_mode='r')
+        return self
+
+    def __len__(self):
+        return self.X.shape[0]
+
+    def __getitem__(self, i):
+        return self.X[i], self.Y[i]
+
+    def to_audio(self, masks, mix):
+        """masks_to_audio con los parámetros de este caché."""
+        return masks_to_audio(mix, masks, self.params['n_fft'], self.params['hop'], self.params['window'], n_samples(self.mixer.duration, self.mixer.sr))
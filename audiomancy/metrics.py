@@ -0,0 +1,172 @@
+"""Instrumentación por etapa del pipeline de mezclas.
+
+Un objeto Metrics se le pasa a cacophony (metrics=...) y acumula, para
+cada etapa de read_from_jams y generate_random (lectura del .jams,
+lectura de ventanas, pitch/tempo, loudness, mezcla, escritura en los
+tensores, generación con scaper, puntos de control...), cuántas veces
+corrió, el tiempo total y un histograma de duraciones, además de los
+bytes reservados.
+
+Es lo bastante barato para dejarlo prendido: cada medición es un par de
+perf_counter_ns y una suma en un diccionario, y el histograma usa cubos
+de potencias de dos (el bit_length de los nanosegundos). Opcionalmente
+guarda cada tramo para exportarlo como traza de Chrome
+(chrome://tracing o https://ui.perfetto.dev).
+
+    metrics = Metrics(trace=True)
+    mixer = cacophony(metrics=metrics)
+    X, Y = mixer.read_from_jams()
+    metrics.summary()
+    metrics.to_chrome_trace('trace.json')
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+class Metrics:
+    """Contadores, histogramas de duración y bytes por etapa."""
+    def __init__(self, trace: bool = False, max_events: int = 1_000_000):
+        """
+        Args:
+            trace (bool, optional): Guarda cada tramo para la traza de
+            Chrome. Por defecto, False.
+            max_events (int, optional): Tope de tramos guardados, para
+            que la traza no crezca sin límite. Por defecto, 1 000 000.
+        """
+        self.trace = trace
+        self.max_events = max_events
+        self.stages = {}
+        self.counters = {}
+        self.events = []
+
+    def __getstate__(self):
+        # Cada proceso del pool empieza con métricas vacías; el proceso
+        # principal junta lo que devuelven con merge.
+        return {'trace': self.trace, 'max_events': self.max_events}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @contextmanager
+    def stage(self, name: str, nbytes: int = 0):
+        """Mide el bloque como una ejecución de la etapa name."""
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter_ns() - start, nbytes, start)
+
+    def record(self, name: str, elapsed_ns: int, nbytes: int = 0, start_ns: int | None = None):
+        """Registra una ejecución de la etapa name que tardó elapsed_ns."""
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = {'count': 0, 'total_ns': 0, 'min_ns': elapsed_ns, 'max_ns': 0, 'bytes': 0, 'histogram': {}}
+
+        stats['count'] += 1
+        stats['total_ns'] += elapsed_ns
+        stats['bytes'] += nbytes
+        stats['min_ns'] = min(stats['min_ns'], elapsed_ns)
+        stats['max_ns'] = max(stats['max_ns'], elapsed_ns)
+
+        bucket = int(elapsed_ns).bit_length()
+        stats['histogram'][bucket] = stats['histogram'].get(bucket, 0) + 1
+
+        if self.trace and len(self.events) < self.max_events:
+            start_ns = start_ns if start_ns is not None else time.perf_counter_ns() - elapsed_ns
+            self.events.append((name, start_ns, elapsed_ns, os.getpid(), threading.get_ident()))
+
+    def count(self, name: str, value: int = 1):
+        """Suma value al contador name."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def pop_state(self) -> dict:
+        """Devuelve lo acumulado y deja el objeto vacío (para enviar las
+        métricas de un proceso del pool al principal).
+        """
+        state = {'stages': self.stages, 'counters': self.counters, 'events': self.events}
+        self.stages, self.counters, self.events = {}, {}, []
+        return state
+
+    def merge(self, state: dict | None):
+        """Suma lo acumulado en otro proceso (ver pop_state)."""
+        if state is None:
+            return
+        for name, other in state['stages'].items():
+            stats = self.stages.get(name)
+            if stats is None:
+                self.stages[name] = other
+                continue
+
+            stats['count'] += other['count']
+            stats['total_ns'] += other['total_ns']
+            stats['bytes'] += other['bytes']
+            stats['min_ns'] = min(stats['min_ns'], other['min_ns'])
+            stats['max_ns'] = max(stats['max_ns'], other['max_ns'])
+            for bucket, n in other['histogram'].items():
+                stats['histogram'][bucket] = stats['histogram'].get(bucket, 0) + n
+
+        for name, value in state['counters'].items():
+            self.count(name, value)
+
+        if self.trace:
+            self.events.extend(state['events'][:max(0, self.max_events - len(self.events))])
+
+    def summary(self) -> dict:
+        """Resumen por etapa en segundos. El histograma va como
+        {límite superior en segundos: cantidad}.
+        """
+        return {
+            'stages': {
+                name: {
+                    'count': stats['count'],
+                    'total_s': stats['total_ns'] / 1e9,
+                    'mean_s': stats['total_ns'] / stats['count'] / 1e9,
+                    'min_s': stats['min_ns'] / 1e9,
+                    'max_s': stats['max_ns'] / 1e9,
+                    'bytes': stats['bytes'],
+                    'histogram': {2 ** bucket / 1e9: n for bucket, n in sorted(stats['histogram'].items())}
+                } for name, stats in self.stages.items()
+            },
+            'counters': dict(self.counters)
+        }
+
+    def to_chrome_trace(self, path: str):
+        """Exporta los tramos guardados (trace=True) en formato Trace
+        Event de Chrome. Los tiempos van en microsegundos desde el primer
+        tramo; perf_counter_ns es monotónico para todo el sistema, así que
+        los tramos de los procesos del pool quedan alineados.
+        """
+        origin = min((event[1] for event in self.events), default=0)
+        events = [{
+            'name': name,
+            'ph': 'X',
+            'ts': (start_ns - origin) / 1e3,
+            'dur': elapsed_ns / 1e3,
+            'pid': pid,
+            'tid': tid
+        } for name, start_ns, elapsed_ns, pid, tid in self.events]
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+class _NullMetrics:
+    """Sustituto sin costo cuando no se piden métricas."""
+    @contextmanager
+    def stage(self, name: str, nbytes: int = 0):
+        yield
+
+    def record(self, name: str, elapsed_ns: int, nbytes: int = 0, start_ns: int | None = None):
+        pass
+
+    def count(self, name: str, value: int = 1):
+        pass
+
+    def pop_state(self):
+        return None
+
+    def merge(self, state):
+        pass
+
+NULL_METRICS = _NullMetrics()
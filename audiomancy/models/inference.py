@@ -0,0 +1,153 @@
+"""Inferencia por ventanas sobre canciones completas.
+
+El pipeline de entrenamiento trabaja con clips fijos de 5 segundos
+(220500 muestras). Para separar una canción completa, separate_file la
+lee por bloques en ventanas de ese largo con solapamiento, pasa las
+ventanas en lotes a cualquier separador y vuelve a unir las seis
+salidas con overlap-add, escribiendo cada pista a disco a medida que
+sus muestras quedan completas. En memoria nunca hay más que un lote de
+ventanas, así que el consumo no depende de la duración de la canción.
+
+Un separador es cualquier función que recibe un lote (B, canales,
+ventana) y devuelve (B, canales, ventana, 6), con las pistas en el
+orden de LABELS (la misma disposición que X e Y de read_from_jams).
+
+    separator = BandSplitSeparator(sr=44100)
+    separate_file('cancion.wav', separator, 'salida/', overlap=0.25, batch_size=8)
+
+Las ventanas se ponderan con rampas lineales en la zona de
+solapamiento (suman uno donde se cruzan), salvo el inicio de la primera
+y el final de la última.
+"""
+import numpy as np
+np.float_ = np.float64
+np.Inf = np.inf
+import soundfile
+import os
+
+class BandSplitSeparator:
+    """Separador de referencia: reparte el espectro de cada ventana en
+    seis bandas de frecuencia, una por pista. Las máscaras son binarias
+    y cubren todo el espectro, así que las seis salidas suman la entrada.
+    Sirve para medir rendimiento y memoria del motor, no para separar.
+    """
+    def __init__(self, sr: int = 44100, edges: tuple = (150, 400, 1000, 2500, 6000)):
+        """
+        Args:
+            sr (int, optional): Frecuencia de muestreo (hercios). Por
+            defecto, 44100.
+            edges (tuple, optional): Cinco frecuencias de corte (hercios)
+            entre las seis bandas.
+        """
+        self.sr = sr
+        self.edges = np.asarray(edges, dtype='float64')
+
+    def __call__(self, batch):
+        window = batch.shape[-1]
+        spectrum = np.fft.rfft(batch, axis=-1)
+        band = np.searchsorted(self.edges, np.fft.rfftfreq(window, 1 / self.sr), side='right')
+        masks = np.eye(len(self.edges) + 1, dtype=spectrum.real.dtype)[band]  # (F, 6)
+
+        stems = np.fft.irfft(spectrum[..., None] * masks, n=window, axis=-2)
+        return stems.astype(batch.dtype, copy=False)
+
+def _taper(window: int, overlap: int, first: bool, last: bool):
+    """Pesos de una ventana: rampas lineales en el solapamiento."""
+    weights = np.ones(window)
+    if overlap > 0:
+        ramp = np.linspace(0, 1, overlap + 2)[1:-1]
+        if not first:
+            weights[:overlap] = ramp
+        if not last:
+            weights[-overlap:] = ramp[::-1]
+    return weights
+
+def separate_file(audio_path: str, separator, out_dir: str, window: int | None = None, overlap: float = 0.25, batch_size: int = 8, subtype: str = 'FLOAT', dtype: str = 'float32') -> dict:
+    """Separa un archivo de audio de cualquier duración en las seis pistas
+    de LABELS, escribiendo un .wav por pista en out_dir.
+
+    Args:
+        audio_path (str): Archivo de entrada (cualquier formato de soundfile).
+        separator (callable): Función (B, canales, ventana) ->
+        (B, canales, ventana, 6).
+        out_dir (str): Carpeta de salida.
+        window (int, optional): Muestras por ventana. Por defecto, 5
+        segundos a la frecuencia del archivo, como en el entrenamiento
+        (220500 a 44100 Hz).
+        overlap (float, optional): Fracción de solapamiento entre ventanas
+        consecutivas, en [0, 1). Por defecto, 0.25.
+        batch_size (int, optional): Ventanas por llamada al separador. Por
+        defecto, 8.
+        subtype (str, optional): Subtipo de los .wav de salida. Por
+        defecto, 'FLOAT'.
+        dtype (str, optional): Tipo de dato de las ventanas. Por defecto,
+        'float32'.
+
+    Returns:
+        dict: Ruta del .wav de cada label.
+    """
+    from ..constants import LABELS
+    from ..tiers import n_samples
+
+    if not 0 <= overlap < 1:
+        raise ValueError('overlap debe estar en [0, 1).')
+
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {label: os.path.join(out_dir, f'{label}.wav') for label in LABELS.keys()}
+
+    with soundfile.SoundFile(audio_path) as f:
+        total, channels, sr = f.frames, f.channels, f.samplerate
+        window = window if window is not None else n_samples(5.0, sr)
+        n_overlap = int(window * overlap)
+        hop = window - n_overlap
+        n_windows = max(1, -(-(total - n_overlap) // hop))
+        span = (batch_size - 1) * hop + window
+
+        writers = [soundfile.SoundFile(path, 'w', samplerate=sr, channels=channels, subtype=subtype) for path in paths.values()]
+        inbuf = np.zeros((0, channels), dtype=dtype)   # Entrada desde in_base.
+        in_base = 0
+        acc = np.zeros((span, channels, len(LABELS)), dtype='float64')
+        norm = np.zeros((span,), dtype='float64')
+        batch = np.zeros((batch_size, channels, window), dtype=dtype)
+
+        try:
+            for first in range(0, n_windows, batch_size):
+                starts = [k * hop for k in range(first, min(first + batch_size, n_windows))]
+                out_base = starts[0]
+
+                need = starts[-1] + window - (in_base + inbuf.shape[0])
+                if need > 0:
+                    inbuf = np.concatenate([inbuf, f.read(need, dtype=dtype, always_2d=True)])
+
+                batch[:] = 0
+                for j, start in enumerate(starts):
+                    chunk = inbuf[start - in_base:start - in_base + window]
+                    batch[j, :, :chunk.shape[0]] = chunk.T
+
+                stems = separator(batch[:len(starts)])
+
+                for j, start in enumerate(starts):
+                    k = first + j
+                    weights = _taper(window, n_overlap, k == 0, k == n_windows - 1)
+                    offset = start - out_base
+                    acc[offset:offset + window] += np.transpose(stems[j], (1, 0, 2)) * weights[:, None, None]
+                    norm[offset:offset + window] += weights
+
+                # Todo lo anterior a la siguiente ventana ya no cambia.
+                ready = min(starts[-1] + hop if k < n_windows - 1 else total, total) - out_base
+                done = acc[:ready] / np.maximum(norm[:ready], 1e-12)[:, None, None]
+                for s, writer in enumerate(writers):
+                    writer.write(done[:, :, s])
+
+                acc[:span - ready] = acc[ready:]
+                acc[span - ready:] = 0
+                norm[:span - ready] = norm[ready:]
+                norm[span - ready:] = 0
+
+                inbuf = inbuf[starts[-1] + hop - in_base:]
+                in_base = starts[-1] + hop
+        finally:
+            for writer in writers:
+                writer.close()
+
+    return paths
@@ -0,0 +1,332 @@
+"""Reconstrucción en memoria de las mezclas descritas en los .jams.
+
+scaper.generate_from_jams solo acepta rutas: obliga a escribir cada
+anotación en un .jams temporal para que scaper la vuelva a leer. Aquí
+se arma la anotación directamente en memoria (a partir de un objeto
+jams.Annotation o de una lista simple de eventos) y se le entrega al
+sintetizador de scaper, sin el .jams temporal. Eso sí, scaper sigue
+pasando cada evento por SoX como archivo temporal; para reconstruir sin
+escribir nada en disco, usar engine='numpy'.
+
+Si se compiló un almacén de stems (audiomancy.stemstore), la ventana
+de cada evento se toma directamente del memmap y se le pasa a SoX como
+array, replicando la cadena de scaper 1.6 sin decodificar ningún .wav:
+pitch y tempo en SoX, loudness medida sobre ese resultado, ganancia por
+SNR respecto de ref_db y, al final, los fades de cuarto de seno.
+
+Con engine='numpy' la misma cadena corre en proceso (audiomancy.dsp),
+sin lanzar SoX: las ventanas salen del almacén o se leen directamente
+del .wav con soundfile.
+
+Con un caché de eventos (audiomancy.eventcache), los eventos que ya se
+transformaron antes se leen de disco y solo se les aplica el SNR.
+
+Un evento es un diccionario con las mismas llaves que el valor de cada
+observación del namespace 'scaper':
+
+    {
+        'label': 'bass',
+        'source_file': 'stems\\bass\\bass_x.wav',
+        'source_time': 0.66,
+        'event_time': 0,
+        'event_duration': 5.0,
+        'snr': -1.29,
+        'role': 'foreground',
+        'pitch_shift': 0.67,
+        'time_stretch': 0.97
+    }
+"""
+import numpy as np
+np.float_ = np.float64
+np.Inf = np.inf
+import soundfile
+import jams
+import os
+import re
+
+from .metrics import NULL_METRICS
+from .tiers import n_samples
+
+def events_from_annotation(ann) -> list:
+    """Convierte una anotación del namespace 'scaper' en una lista de
+    eventos (diccionarios), en el mismo orden de la anotación.
+    """
+    return [dict(obs.value) for obs in ann.data]
+
+def resolve_source(source_file: str, fg_path: str) -> str:
+    """Reubica el source_file guardado en el .jams dentro de fg_path.
+
+    Los .jams se generaron en Windows, así que las rutas vienen como
+    'stems\\label\\archivo.wav'. Se conservan solo la carpeta del label
+    y el nombre del archivo, aceptando ambos separadores.
+    """
+    parts = [part for part in re.split(r'[\\/]+', source_file) if part]
+    return os.path.join(fg_path, *parts[-2:])
+
+def annotation_from_events(events: list, fg_path: str, duration: float = 5.0, sr: int = 44100, ref_db: float = -20, n_channels: int = 1, fix_clipping: bool = True):
+    """Arma en memoria una anotación de scaper con los eventos dados y
+    las rutas resueltas dentro de fg_path.
+    """
+    ann = jams.Annotation(namespace='scaper', time=0, duration=duration)
+
+    for event in events:
+        value = dict(event)
+        value['source_file'] = resolve_source(value['source_file'], fg_path)
+        value.setdefault('role', 'foreground')
+        value.setdefault('event_time', 0)
+
+        stretch = value.get('time_stretch') or 1.0
+        ann.append(
+            time=value['event_time'],
+            duration=min(value['event_duration'] * stretch, duration - value['event_time']),
+            value=value,
+            confidence=1.0
+        )
+
+    ann.sandbox.update(scaper={
+        'duration': duration,
+        'original_duration': duration,
+        'fg_path': fg_path,
+        'bg_path': fg_path,
+        'sr': sr,
+        'ref_db': ref_db,
+        'n_channels': n_channels,
+        'fix_clipping': fix_clipping
+    })
+
+    return ann
+
+def _transform_sox(window, event: dict, sr: int, n_channels: int):
+    """Aplica a la ventana del stem la misma cadena de SoX que scaper:
+    canales, pitch shift y time stretch. Los fades van después de la
+    ganancia (ver _render_native). Entra y sale como array.
+    """
+    import sox
+
+    tfm = sox.Transformer()
+    tfm.set_globals(verbosity=0)
+    tfm.convert(samplerate=sr, n_channels=n_channels)
+
+    if event.get('pitch_shift') is not None:
+        tfm.pitch(event['pitch_shift'])
+
+    if event.get('time_stretch') is not None:
+        tfm.tempo(1.0 / float(event['time_stretch']), audio_type='s')
+
+    audio = tfm.build_array(input_array=np.asarray(window, dtype='float32'), sample_rate_in=sr)
+    return audio.reshape(audio.shape[0], -1)
+
+def _transform_numpy(window, event: dict, sr: int, n_channels: int):
+    """Misma cadena que _transform_sox, pero en NumPy (audiomancy.dsp)."""
+    from .dsp import pitch_time
+
+    audio = pitch_time(np.asarray(window, dtype='float64'), sr, event.get('pitch_shift'), event.get('time_stretch'))
+    return np.repeat(audio[:, None], n_channels, axis=1)
+
+def _load_window(event: dict, fg_path: str, sr: int):
+    """Lee del .wav solo la ventana del evento, en mono y a sr.
+
+    La ventana se corta sobre la grilla de sr igual que StemStore.window
+    (inicio int(source_time * sr) y n_samples muestras), así que coincide
+    con la del almacén de ese nivel. Si el archivo tiene otra frecuencia,
+    se lee desde un punto común a ambas grillas y con un margen a cada
+    lado, que se descarta después de remuestrear.
+    """
+    from math import gcd
+    from .dsp import resample
+
+    path = resolve_source(event['source_file'], fg_path)
+    info = soundfile.info(path)
+    file_sr = info.samplerate
+
+    total = -(-info.frames * sr // file_sr)     # Largo del stem a sr, como en librosa.load.
+    begin = min(int(event['source_time'] * sr), total)
+    end = min(begin + n_samples(event['event_duration'], sr), total)
+
+    step = file_sr // gcd(file_sr, sr)
+    margin = 0 if file_sr == sr else int(0.05 * file_sr)
+    first = max(0, (begin * file_sr // sr - margin) // step * step)
+    last = min(info.frames, -(-end * file_sr // sr) + margin)
+
+    audio, _ = soundfile.read(path, start=first, frames=last - first, dtype='float32', always_2d=True)
+    audio = resample(audio.mean(axis=1), file_sr, sr)
+
+    offset = first * sr // file_sr
+    window = audio[begin - offset:end - offset]
+    # Al final del stem, el remuestreo de un tramo puede dar una muestra menos.
+    return np.pad(window, (0, end - begin - window.shape[0]))
+
+def _stem_version(event: dict, fg_path: str, store) -> tuple:
+    """(mtime, tamaño) del stem del evento: los registrados en el almacén
+    si las ventanas salen de él, o los del archivo si no.
+    """
+    from .stemstore import _stem_key
+
+    if store is not None:
+        entry = store.index['files'][_stem_key(event['source_file'])]
+        return entry['mtime'], entry['size']
+    else:
+        stat = os.stat(resolve_source(event['source_file'], fg_path))
+        return stat.st_mtime_ns, stat.st_size
+
+def _render_native(events: list, fg_path: str, store, engine: str, duration: float, sr: int, ref_db: float, n_channels: int, fix_clipping: bool, fade_in_len: float, fade_out_len: float, metrics = NULL_METRICS, stem_index = None, event_cache = None):
+    """Mezcla los eventos con la cadena propia (engine 'sox' o 'numpy').
+    Las ventanas salen del almacén de stems si hay uno, y la loudness de
+    cada ventana, del índice de stems si hay uno. Con un caché de eventos,
+    los aciertos se toman ya transformados y normalizados, y solo se les
+    aplica la ganancia del SNR. Devuelve la mezcla, las pistas y el factor
+    de escala por clipping. Cada etapa se mide en metrics (cache, decode,
+    transform, loudness, mix y clipping).
+    """
+    from .dsp import integrated_lufs, peak_normalize, fade
+
+    if store is not None and store.sr != sr:
+        raise ValueError(f'El almacén de stems está compilado a {store.sr} Hz, pero se pidió {sr} Hz.')
+
+    transform = _transform_numpy if engine == 'numpy' else _transform_sox
+    length = n_samples(duration, sr)
+    mix_audio = np.zeros((length, n_channels))
+    stem_list = []
+
+    for event in events:
+        normalized = None
+        if event_cache is not None:
+            event = event_cache.prepare(event)
+            key = event_cache.key(event, _stem_version(event, fg_path, store), sr, n_channels, engine, fade_in_len, fade_out_len, stem_index is not None)
+            with metrics.stage('cache'):
+                normalized = event_cache.get(key)
+        else:
+            pass
+
+        if normalized is None:
+            with metrics.stage('decode'):
+                if store is not None:
+                    window = store.window(event['source_file'], event['source_time'], event['event_duration'])
+                else:
+                    window = _load_window(event, fg_path, sr)
+
+            with metrics.stage('transform'):
+                event_audio = transform(window, event, sr, n_channels)
+
+            with metrics.stage('loudness'):
+                lufs = None
+                if stem_index is not None and event['source_file'] in stem_index:
+                    lufs = stem_index.window_lufs(event['source_file'], event['source_time'], event['event_duration'], n_channels)
+                if lufs is None:
+                    lufs = integrated_lufs(event_audio, sr)
+                if np.isfinite(lufs):
+                    normalized = event_audio * 10 ** (-lufs / 20)
+                else:   # Una ventana en silencio se queda en ceros.
+                    normalized = np.zeros_like(event_audio)
+                    metrics.count('silent_events')
+
+                # Como en scaper, los fades van después de medir la loudness.
+                normalized = fade(normalized, sr, fade_in_len, fade_out_len)
+
+            if event_cache is not None:
+                with metrics.stage('cache'):
+                    event_cache.put(key, normalized)
+            else:
+                pass
+
+            metrics.count('decoded_bytes', window.nbytes)
+        else:
+            metrics.count('cached_events')
+
+        event_audio = normalized * 10 ** ((ref_db + event['snr']) / 20)
+
+        with metrics.stage('mix', nbytes=length * n_channels * 8):
+            stem_audio = np.zeros((length, n_channels))
+            start = int(event.get('event_time', 0) * sr)
+            n = max(0, min(event_audio.shape[0], length - start))
+            stem_audio[start:start + n] = event_audio[:n]
+
+            mix_audio += stem_audio
+            stem_list.append(stem_audio)
+
+        metrics.count('events')
+
+    scale_factor = 1.0
+    if fix_clipping and np.max(np.abs(mix_audio)) > 1:
+        with metrics.stage('clipping'):
+            mix_audio, stem_list, scale_factor = peak_normalize(mix_audio, stem_list)
+        metrics.count('clipped_mixes')
+
+    return mix_audio, stem_list, scale_factor
+
+def render_events(events, fg_path: str, duration: float = 5.0, sr: int = 44100, ref_db: float = -20, n_channels: int = 1, fix_clipping: bool = True, fade_in_len: float = 0.01, fade_out_len: float = 0.01, store = None, engine: str = 'sox', metrics = None, stem_index = None, event_cache = None):
+    """Sintetiza una mezcla completamente en memoria.
+
+    Args:
+        events (jams.Annotation | list): Anotación del namespace 'scaper'
+        o lista de eventos.
+        fg_path (str): Carpeta de stems.
+        duration (float, optional): Duración de la mezcla (segundos).
+        sr (int, optional): Frecuencia de muestreo (hercios).
+        ref_db (float, optional): Volumen de referencia (dB).
+        n_channels (int, optional): Canales de salida.
+        fix_clipping (bool, optional): Reescala mezcla y pistas si la
+        mezcla satura. Por defecto, True (como en generate_random).
+        fade_in_len (float, optional): Fade de entrada de cada evento (s).
+        fade_out_len (float, optional): Fade de salida de cada evento (s).
+        store (StemStore, optional): Almacén de stems compilado. Si se da,
+        las ventanas salen del memmap en lugar de decodificar los .wav.
+        engine (str, optional): 'sox' (scaper/SoX, como siempre) o 'numpy'
+        (motor nativo en proceso, sin archivos temporales). Por defecto,
+        'sox'.
+        metrics (Metrics, optional): Instrumentación por etapa (ver
+        audiomancy.metrics). Con SoX vía scaper, la síntesis completa se
+        mide como una sola etapa ('synthesize').
+        stem_index (StemIndex, optional): Índice de stems. Con el motor
+        nativo, la loudness de cada ventana sale del índice en lugar de
+        medirse sobre el audio transformado.
+        event_cache (EventCache, optional): Caché de eventos transformados
+        (ver audiomancy.eventcache). Si se da, se usa el motor nativo
+        aunque no haya almacén de stems.
+
+    Returns:
+        mix_audio: Array (muestras, canales) de la mezcla.
+        stem_list: Lista con un array (muestras, canales) por evento.
+    """
+    if isinstance(events, jams.Annotation):
+        sandbox = getattr(events.sandbox, 'scaper', None) or {}
+        fix_clipping = sandbox.get('fix_clipping', fix_clipping)
+        events = events_from_annotation(events)
+    else:
+        pass
+
+    if metrics is None:
+        metrics = NULL_METRICS
+    else:
+        pass
+
+    if engine not in ('sox', 'numpy'):
+        raise ValueError(f"Motor de mezcla no válido: {engine}. Usar 'sox' o 'numpy'.")
+
+    if store is not None or engine == 'numpy' or event_cache is not None:
+        mix_audio, stem_list, _ = _render_native(events, fg_path, store, engine, duration, sr, ref_db, n_channels, fix_clipping, fade_in_len, fade_out_len, metrics, stem_index, event_cache)
+        return mix_audio, stem_list
+    else:
+        pass
+
+    import scaper
+
+    ann = annotation_from_events(events, fg_path, duration, sr, ref_db, n_channels, fix_clipping)
+
+    sc = scaper.Scaper(duration=duration, fg_path=fg_path, bg_path=fg_path)
+    sc.sr = sr
+    sc.n_channels = n_channels
+    sc.ref_db = ref_db
+    sc.fade_in_len = fade_in_len
+    sc.fade_out_len = fade_out_len
+
+    with metrics.stage('synthesize'):
+        mix_audio, stem_list, _, _ = sc._generate_audio(None, ann, fix_clipping=fix_clipping)
+    metrics.count('events', len(events))
+    """_generate_audio es el sintetizador interno que usa generate_from_jams
+    después de leer el archivo. Con audio_path=None no escribe la mezcla
+    ni las pistas y solo devuelve los arrays, aunque cada evento pasa por
+    un archivo temporal de SoX.
+    """
+
+    return mix_audio, stem_list
@@ -0,0 +1,274 @@
+"""Índice precalculado de los stems.
+
+Para cada stem de las carpetas de LABELS se guarda, una sola vez:
+duración, frecuencia de muestreo, loudness integrada, intervalos no
+silenciosos (librosa.effects.split) y la energía de sus bloques de
+loudness de 400 ms cada 100 ms (ver dsp.loudness_blocks).
+
+    common/stemindex.npz
+      keys, duration, sr, lufs, mtime, size     (una fila por stem)
+      top_db                                    (umbral de los intervalos)
+      intervals, interval_offsets               (segundos, (n, 2))
+      blocks, block_offsets                     (float32)
+
+Con el índice, la generación ya no abre ningún archivo de audio para
+sortear eventos: elige la ventana de cada evento dentro de una región
+activa del stem. Al mezclar con el motor nativo, la loudness de cada
+ventana se obtiene de sus bloques en lugar de medirla sobre el audio
+transformado (el pitch shift y el time stretch casi no la cambian).
+
+El índice se construye en paralelo y, como StemStore, se actualiza
+solo para los archivos que cambiaron de mtime o tamaño. Si cambia top_db,
+los intervalos guardados ya no sirven y se reanaliza todo.
+
+    mixer = cacophony()
+    mixer.index_stems(workers=8)
+    mixer.generate_random(1000)
+"""
+import numpy as np
+np.float_ = np.float64
+np.Inf = np.inf
+import soundfile
+import os
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+
+from .stemstore import _scan, _stem_key
+
+BLOCK = 0.4
+STEP = 0.1
+
+def _analyze_stem(path: str, top_db: float) -> dict:
+    """Duración, loudness, intervalos activos y bloques de un stem."""
+    import librosa
+    from .dsp import loudness_blocks, gated_lufs
+
+    audio, sr = soundfile.read(path, dtype='float32', always_2d=True)
+    audio = audio.mean(axis=1)
+
+    intervals = librosa.effects.split(audio, top_db=top_db) / sr if audio.shape[0] else np.zeros((0, 2))
+    blocks = loudness_blocks(audio, sr, BLOCK, STEP)
+
+    return {
+        'duration': audio.shape[0] / sr,
+        'sr': sr,
+        'lufs': gated_lufs(blocks),
+        'intervals': np.asarray(intervals, dtype='float64').reshape(-1, 2),
+        'blocks': blocks
+    }
+
+class StemIndex:
+    """Índice de solo lectura. Las llaves son 'label/archivo.wav'."""
+    def __init__(self, index_path: str):
+        """Abre un índice ya construido.
+
+        Args:
+            index_path (str): Archivo .npz del índice.
+        """
+        self.index_path = index_path
+
+        with np.load(index_path, allow_pickle=False) as npz:
+            self.keys = [str(key) for key in npz['keys']]
+            self.duration = npz['duration']
+            self.sr = npz['sr']
+            self.lufs = npz['lufs']
+            self.mtime = npz['mtime']
+            self.size = npz['size']
+            self.intervals = npz['intervals']
+            self.interval_offsets = npz['interval_offsets']
+            self.blocks = npz['blocks']
+            self.block_offsets = npz['block_offsets']
+            # Los índices anteriores a top_db no lo guardaban: quedan viejos.
+            self.top_db = float(npz['top_db']) if 'top_db' in npz.files else None
+
+        self.rows = {key: i for i, key in enumerate(self.keys)}
+        self.by_label = {}
+        for i, key in enumerate(self.keys):
+            self.by_label.setdefault(key.split('/')[0], []).append(i)
+
+    def __getstate__(self):
+        # Como en StemStore, a otros procesos solo viaja la ruta.
+        return {'index_path': self.index_path}
+
+    def __setstate__(self, state):
+        self.__init__(state['index_path'])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, source_file: str):
+        return _stem_key(source_file) in self.rows
+
+    def entry(self, source_file: str) -> dict:
+        """Datos de un stem: duration, sr, lufs e intervals."""
+        i = self.rows[_stem_key(source_file)]
+        return {
+            'duration': float(self.duration[i]),
+            'sr': int(self.sr[i]),
+            'lufs': float(self.lufs[i]),
+            'intervals': self.intervals[self.interval_offsets[i]:self.interval_offsets[i + 1]]
+        }
+
+    def window_lufs(self, source_file: str, start: float, duration: float, n_channels: int = 1):
+        """Loudness integrada de [start, start + duration) a partir de los
+        bloques guardados. Devuelve None si la ventana es más corta que un
+        bloque (entonces hay que medirla sobre el audio).
+        """
+        from .dsp import gated_lufs
+
+        i = self.rows[_stem_key(source_file)]
+        blocks = self.blocks[self.block_offsets[i]:self.block_offsets[i + 1]]
+
+        first = int(np.ceil(start / STEP - 1e-6))
+        last = min(int(np.floor((start + duration - BLOCK) / STEP + 1e-6)) + 1, blocks.shape[0])
+        if last <= first:
+            return None
+
+        return gated_lufs(blocks[first:last], n_channels)
+
+    def sample_events(self, rng, labels: list, duration: float, snr: tuple = (-5, 5), pitch_shift: tuple = (-2, 2), time_stretch: tuple = (0.8, 1.2)) -> list:
+        """Sortea un evento por label con los rangos de generate_random,
+        pero con la ventana dentro de una región activa del stem.
+
+        event_duration se acorta, como en scaper, para que el evento
+        estirado quepa en la mezcla y para no pasarse del stem. Entre los
+        intervalos activos que alcanzan para la ventana se elige uno con
+        probabilidad proporcional a los inicios posibles; si ninguno
+        alcanza, el inicio se sortea en todo el archivo.
+
+        Args:
+            rng (np.random.Generator): Generador de números aleatorios.
+            labels (list): Labels de los eventos, en orden.
+            duration (float): Duración de la mezcla (segundos).
+
+        Returns:
+            list: Eventos (diccionarios con las llaves de scaper).
+        """
+        events = []
+
+        for label in labels:
+            rows = self.by_label.get(label)
+            if not rows:
+                raise FileNotFoundError(f'El índice de stems no tiene archivos de {label}.')
+
+            i = rows[rng.integers(len(rows))]
+            source_duration = float(self.duration[i])
+            stretch = float(rng.uniform(*time_stretch))
+            event_duration = min(duration, duration / stretch, source_duration)
+
+            intervals = self.intervals[self.interval_offsets[i]:self.interval_offsets[i + 1]]
+            room = intervals[:, 1] - intervals[:, 0] - event_duration
+            if np.any(room >= 0):
+                weights = np.clip(room, 0, None) + (room >= 0) * 1e-6
+                k = rng.choice(intervals.shape[0], p=weights / weights.sum())
+                source_time = float(intervals[k, 0] + rng.uniform(0, room[k]))
+            else:
+                source_time = float(rng.uniform(0, source_duration - event_duration))
+
+            events.append({
+                'label': label,
+                'source_file': self.keys[i],
+                'source_time': source_time,
+                'event_time': 0,
+                'event_duration': event_duration,
+                'snr': float(rng.uniform(*snr)),
+                'role': 'foreground',
+                'pitch_shift': float(rng.uniform(*pitch_shift)),
+                'time_stretch': stretch
+            })
+
+        return events
+
+    @classmethod
+    def build(cls, fg_path: str | None = None, index_path: str | None = None, top_db: float = 60, workers: int = 1, force: bool = False):
+        """Analiza todos los stems y guarda el índice. Los archivos que no
+        cambiaron desde el índice anterior se reutilizan, siempre que ese
+        índice se haya construido con el mismo top_db.
+
+        Args:
+            fg_path (str, optional): Carpeta de stems. Por defecto, STEMS_PATH.
+            index_path (str, optional): Archivo .npz. Por defecto, STEM_INDEX.
+            top_db (float, optional): Umbral de silencio de
+            librosa.effects.split (dB bajo el pico). Por defecto, 60.
+            workers (int, optional): Procesos en paralelo. Por defecto, 1.
+            force (bool, optional): Reanaliza todo aunque esté al día.
+
+        Returns:
+            StemIndex: Índice abierto.
+        """
+        from .constants import STEMS_PATH, STEM_INDEX
+
+        if fg_path is None:
+            fg_path = STEMS_PATH
+        else:
+            pass
+
+        if index_path is None:
+            index_path = STEM_INDEX
+        else:
+            pass
+
+        files = _scan(fg_path)
+        previous = cls(index_path) if os.path.exists(index_path) and not force else None
+        if previous is not None and previous.top_db != float(top_db):
+            previous = None     # Otro umbral: los intervalos guardados no sirven.
+        else:
+            pass
+
+        entries = {}
+        pending = []
+
+        for key, info in files.items():
+            i = previous.rows.get(key) if previous is not None else None
+            if i is not None and previous.mtime[i] == info['mtime'] and previous.size[i] == info['size']:
+                entries[key] = {
+                    'duration': float(previous.duration[i]),
+                    'sr': int(previous.sr[i]),
+                    'lufs': float(previous.lufs[i]),
+                    'intervals': previous.intervals[previous.interval_offsets[i]:previous.interval_offsets[i + 1]],
+                    'blocks': previous.blocks[previous.block_offsets[i]:previous.block_offsets[i + 1]]
+                }
+            else:
+                pending.append(key)
+
+        if previous is not None and not pending and entries.keys() == previous.rows.keys():
+            return previous
+        else:
+            pass
+
+        print(f'Indexando {len(pending)} stems.')
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = pool.map(_analyze_stem, [files[key]['path'] for key in pending], [top_db] * len(pending), chunksize=4)
+                for key, entry in zip(pending, tqdm(results, total=len(pending))):
+                    entries[key] = entry
+        else:
+            for key in tqdm(pending):
+                entries[key] = _analyze_stem(files[key]['path'], top_db)
+
+        keys = list(files.keys())
+        tmp = index_path[:-len('.npz')] + '.tmp.npz'   # np.savez agrega .npz si falta.
+        os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+
+        np.savez(
+            tmp,
+            keys=np.array(keys, dtype=str),
+            duration=np.array([entries[key]['duration'] for key in keys], dtype='float64'),
+            sr=np.array([entries[key]['sr'] for key in keys], dtype='int64'),
+            lufs=np.array([entries[key]['lufs'] for key in keys], dtype='float64'),
+            mtime=np.array([files[key]['mtime'] for key in keys], dtype='int64'),
+            size=np.array([files[key]['size'] for key in keys], dtype='int64'),
+            intervals=np.concatenate([entries[key]['intervals'] for key in keys] or [np.zeros((0, 2))]).reshape(-1, 2),
+            interval_offsets=np.cumsum([0] + [entries[key]['intervals'].shape[0] for key in keys]),
+            blocks=np.concatenate([entries[key]['blocks'] for key in keys] or [np.zeros((0,), dtype='float32')]),
+            block_offsets=np.cumsum([0] + [entries[key]['blocks'].shape[0] for key in keys]),
+            top_db=np.float64(top_db)
+        )
+        previous = None
+        os.replace(tmp, index_path)
+
+        return cls(index_path)
+
+def build_stem_index(fg_path: str | None = None, index_path: str | None = None, top_db: float = 60, workers: int = 1, force: bool = False) -> StemIndex:
+    """Atajo para StemIndex.build."""
+    return StemIndex.build(fg_path=fg_path, index_path=index_path, top_db=top_db, workers=workers, force=force)
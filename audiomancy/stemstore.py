@@ -0,0 +1,218 @@
+"""Almacén de stems pre-decodificados.
+
+Cada mezcla lee seis archivos .wav de la carpeta de stems, y a lo largo
+de un .jams de 1000 mezclas los mismos cientos de archivos se decodifican
+miles de veces. Este módulo decodifica una sola vez todos los stems de
+las carpetas de LABELS a la frecuencia de muestreo de trabajo y los
+concatena en un único archivo float32 que luego se abre con np.memmap.
+
+    store/
+      +----- stems_44100.f32    (muestras mono concatenadas)
+      +----- stems_44100.json   (índice: offset y longitud por archivo)
+
+El índice guarda también el mtime y el tamaño de cada .wav: si alguno
+cambia, aparece o desaparece, el almacén se reconstruye. Los archivos
+que no cambiaron se copian del almacén anterior en lugar de decodificarse
+otra vez.
+
+Cada frecuencia de muestreo tiene su propio almacén (ver
+audiomancy.tiers); con source, uno nuevo se remuestrea a partir de otro
+ya compilado en lugar de decodificar los .wav.
+"""
+import numpy as np
+np.float_ = np.float64
+np.Inf = np.inf
+import json
+import os
+import re
+from tqdm import tqdm
+
+from .tiers import n_samples
+
+def _stem_key(source_file: str) -> str:
+    """Llave del índice para un stem: 'label/archivo.wav'. Acepta rutas
+    absolutas, relativas y con separadores de Windows.
+    """
+    parts = [part for part in re.split(r'[\\/]+', source_file) if part]
+    return '/'.join(parts[-2:])
+
+def _scan(fg_path: str) -> dict:
+    """Lista los stems de cada carpeta de LABELS con su mtime y tamaño."""
+    from .constants import LABELS
+
+    files = {}
+    for label in LABELS.keys():
+        label_path = os.path.join(fg_path, label)
+        if not os.path.isdir(label_path):
+            continue
+
+        for file in sorted(os.listdir(label_path)):
+            path = os.path.join(label_path, file)
+            if not os.path.isfile(path):
+                continue
+
+            stat = os.stat(path)
+            files[f'{label}/{file}'] = {
+                'path': path,
+                'mtime': stat.st_mtime_ns,
+                'size': stat.st_size
+            }
+
+    return files
+
+class StemStore:
+    """Vista de solo lectura sobre un almacén compilado. Las ventanas
+    que entrega son rebanadas del memmap, sin copias.
+    """
+    def __init__(self, store_path: str, sr: int = 44100):
+        """Abre un almacén ya compilado.
+
+        Args:
+            store_path (str): Carpeta del almacén.
+            sr (int, optional): Frecuencia de muestreo con la que se
+            compiló. Por defecto, 44100 hercios.
+        """
+        self.store_path = store_path
+        self.sr = sr
+
+        with open(self.index_path(store_path, sr), 'r', encoding='utf-8') as f:
+            self.index = json.load(f)
+
+        total = self.index['total']
+        self.data = np.memmap(self.blob_path(store_path, sr), dtype='float32', mode='r', shape=(total,)) if total else np.zeros((0,), dtype='float32')
+
+    @staticmethod
+    def blob_path(store_path: str, sr: int) -> str:
+        return os.path.join(store_path, f'stems_{sr}.f32')
+
+    @staticmethod
+    def index_path(store_path: str, sr: int) -> str:
+        return os.path.join(store_path, f'stems_{sr}.json')
+
+    def __getstate__(self):
+        # Al pasar el almacén a otros procesos solo viaja la ruta; cada
+        # proceso vuelve a abrir el memmap y comparte la caché de páginas.
+        return {'store_path': self.store_path, 'sr': self.sr}
+
+    def __setstate__(self, state):
+        self.__init__(state['store_path'], state['sr'])
+
+    def __len__(self):
+        return len(self.index['files'])
+
+    def __contains__(self, source_file: str):
+        return _stem_key(source_file) in self.index['files']
+
+    def get(self, source_file: str):
+        """Devuelve el stem completo (mono, float32) como vista del memmap."""
+        entry = self.index['files'][_stem_key(source_file)]
+        return self.data[entry['offset']:entry['offset'] + entry['length']]
+
+    def window(self, source_file: str, start: float, duration: float):
+        """Devuelve las muestras de [start, start + duration) segundos del
+        stem, recortadas a su longitud real. No copia datos.
+        """
+        audio = self.get(source_file)
+        begin = min(int(start * self.sr), audio.shape[0])
+        end = min(begin + n_samples(duration, self.sr), audio.shape[0])
+        return audio[begin:end]
+
+    def is_stale(self, fg_path: str) -> bool:
+        """Indica si algún stem cambió (mtime o tamaño), se agregó o se
+        eliminó desde la compilación.
+        """
+        return not _same_files(self.index['files'], _scan(fg_path))
+
+    @classmethod
+    def compile(cls, fg_path: str | None = None, sr: int = 44100, store_path: str | None = None, force: bool = False, source = None):
+        """Decodifica todos los stems en un único archivo float32 y
+        devuelve el almacén abierto. Si ya existe uno al día, solo lo abre.
+
+        Args:
+            fg_path (str, optional): Carpeta de stems. Por defecto, STEMS_PATH.
+            sr (int, optional): Frecuencia de muestreo de destino. Por defecto,
+            44100 hercios.
+            store_path (str, optional): Carpeta del almacén. Por defecto,
+            STORE_PATH.
+            force (bool, optional): Reconstruye aunque esté al día.
+            source (StemStore, optional): Almacén compilado a otra
+            frecuencia. Los stems que tenga al día se remuestrean desde él
+            en lugar de decodificarse. Por defecto, None.
+
+        Returns:
+            StemStore: Almacén abierto.
+        """
+        import librosa
+        from .constants import STEMS_PATH, STORE_PATH
+        from .dsp import resample
+
+        if fg_path is None:
+            fg_path = STEMS_PATH
+        else:
+            pass
+
+        if store_path is None:
+            store_path = STORE_PATH
+        else:
+            pass
+
+        files = _scan(fg_path)
+        previous = None
+
+        if os.path.exists(cls.index_path(store_path, sr)):
+            previous = cls(store_path, sr)
+            if not force and _same_files(previous.index['files'], files):
+                return previous
+            else:
+                pass
+
+        os.makedirs(store_path, exist_ok=True)
+        blob_tmp = cls.blob_path(store_path, sr) + '.tmp'
+        index = {'sr': sr, 'fg_path': fg_path, 'total': 0, 'files': {}}
+
+        print(f'Compilando stems a {sr} Hz.')
+        with open(blob_tmp, 'wb') as blob:
+            for key, info in tqdm(files.items()):
+                old = previous.index['files'].get(key) if previous is not None and not force else None
+
+                base = source.index['files'].get(key) if source is not None else None
+
+                if old is not None and old['mtime'] == info['mtime'] and old['size'] == info['size']:
+                    audio = previous.data[old['offset']:old['offset'] + old['length']]
+                elif base is not None and base['mtime'] == info['mtime'] and base['size'] == info['size']:
+                    audio = resample(np.asarray(source.get(key)), source.sr, sr)
+                else:
+                    audio, _ = librosa.load(info['path'], sr=sr, mono=True)
+
+                audio = np.ascontiguousarray(audio, dtype='float32')
+                blob.write(audio.tobytes())
+
+                index['files'][key] = {
+                    'offset': index['total'],
+                    'length': int(audio.shape[0]),
+                    'mtime': info['mtime'],
+                    'size': info['size']
+                }
+                index['total'] += int(audio.shape[0])
+
+        previous = audio = None    # Soltar el memmap anterior antes de reemplazarlo.
+
+        os.replace(blob_tmp, cls.blob_path(store_path, sr))
+        with open(cls.index_path(store_path, sr), 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+
+        return cls(store_path, sr)
+
+def _same_files(indexed: dict, scanned: dict) -> bool:
+    if indexed.keys() != scanned.keys():
+        return False
+
+    for key, info in scanned.items():
+        if indexed[key]['mtime'] != info['mtime'] or indexed[key]['size'] != info['size']:
+            return False
+
+    return True
+
+def compile_stems(fg_path: str | None = None, sr: int = 44100, store_path: str | None = None, force: bool = False, source = None) -> StemStore:
+    """Atajo para StemStore.compile."""
+    return StemStore.compile(fg_path=fg_path, sr=sr, store_path=store_path, force=force, source=source)
@@ -0,0 +1,51 @@
+"""Niveles de resolución para experimentar rápido.
+
+Los .jams describen cada mezcla en segundos (source_time, event_time,
+event_duration), así que la misma descripción se puede reconstruir a
+cualquier frecuencia de muestreo. A 11025 Hz una mezcla tiene la cuarta
+parte de muestras que a 44100 Hz: barridos de hiperparámetros a un
+cuarto del cómputo y de la memoria, para luego escalar.
+
+    mixer = cacophony()
+    mixer.compile_stems()               # 44100 Hz
+    low = mixer.at_tier(11025)          # almacén derivado del de 44100 Hz
+    X, Y = low.read_from_jams()         # (n, 1, 55125)
+
+Cada nivel tiene su propio almacén de stems (stems_<sr>.f32, ver
+audiomancy.stemstore). Los niveles bajos se remuestrean una sola vez a
+partir del almacén de 44100 Hz, sin volver a decodificar los .wav.
+
+Las muestras de una duración se calculan con n_samples, que redondea:
+int(0.7 * 44100) da 30869 y no 30870.
+"""
+TIERS = (44100, 22050, 11025)
+
+def n_samples(duration: float, sr: int) -> int:
+    """Muestras de duration segundos a sr hercios."""
+    return int(round(duration * sr))
+
+def compile_tiers(fg_path: str | None = None, tiers: tuple = TIERS, store_path: str | None = None, force: bool = False) -> dict:
+    """Compila el almacén de stems de cada nivel. El de mayor frecuencia
+    se decodifica de los .wav y los demás se remuestrean a partir de él.
+
+    Args:
+        fg_path (str, optional): Carpeta de stems. Por defecto, STEMS_PATH.
+        tiers (tuple, optional): Frecuencias de muestreo. Por defecto,
+        TIERS (44100, 22050 y 11025 hercios).
+        store_path (str, optional): Carpeta de los almacenes. Por defecto,
+        STORE_PATH.
+        force (bool, optional): Reconstruye aunque estén al día.
+
+    Returns:
+        dict: Almacén abierto (StemStore) de cada frecuencia.
+    """
+    from .stemstore import StemStore
+
+    tiers = sorted(tiers, reverse=True)
+    base = StemStore.compile(fg_path=fg_path, sr=tiers[0], store_path=store_path, force=force)
+    stores = {tiers[0]: base}
+
+    for sr in tiers[1:]:
+        stores[sr] = StemStore.compile(fg_path=fg_path, sr=sr, store_path=store_path, force=force, source=base)
+
+    return stores
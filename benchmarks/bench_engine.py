@@ -0,0 +1,60 @@
+"""Compara el motor nativo de mezcla (engine='numpy') contra la cadena
+de SoX: mezclas por segundo y parecido de la salida.
+
+Requiere la carpeta de stems. Desde la raíz del repositorio:
+
+    python benchmarks/bench_engine.py --n 50
+    python benchmarks/bench_engine.py --n 50 --store
+
+Con --store, ambos motores toman las ventanas del almacén de stems
+compilado, así que solo se mide la diferencia entre SoX y NumPy.
+"""
+import argparse
+import time
+import numpy as np
+np.float_ = np.float64
+np.Inf = np.inf
+import jams
+
+from audiomancy.audioprocessing import cacophony
+from audiomancy.constants import JAMS_FILE_200
+
+def snr_db(reference, estimate):
+    """SNR de la estimación respecto de la referencia (dB)."""
+    noise = np.sum((reference - estimate) ** 2)
+    return 10 * np.log10(np.sum(reference ** 2) / max(noise, 1e-20))
+
+def run(mixer, annotations):
+    outputs = []
+    start = time.perf_counter()
+    for ann in annotations:
+        outputs.append(mixer.render(ann)[0])
+    elapsed = time.perf_counter() - start
+    return outputs, len(annotations) / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jams', default=JAMS_FILE_200, help='Archivo .jams a reconstruir.')
+    parser.add_argument('--n', type=int, default=20, help='Mezclas a reconstruir por motor.')
+    parser.add_argument('--store', action='store_true', help='Usar el almacén de stems compilado.')
+    args = parser.parse_args()
+
+    annotations = jams.load(args.jams, strict=False).annotations[:args.n]
+    results = {}
+
+    for engine in ('sox', 'numpy'):
+        mixer = cacophony(engine=engine)
+        if args.store:
+            mixer.compile_stems()
+        results[engine] = run(mixer, annotations)
+        print(f'{engine:>6}: {results[engine][1]:.2f} mezclas/s')
+
+    sox_out, sox_rate = results['sox']
+    numpy_out, numpy_rate = results['numpy']
+    snrs = [snr_db(a, b) for a, b in zip(sox_out, numpy_out)]
+
+    print(f'Aceleración: {numpy_rate / sox_rate:.1f}x')
+    print(f'SNR numpy vs. sox: mediana {np.median(snrs):.1f} dB, mínimo {np.min(snrs):.1f} dB')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Tiempo de import audiomancy.
+
+Cada proceso de un DataLoader importa el paquete, así que import
+audiomancy debe ser barato: sin subprocesos (SoX se revisa recién al
+mezclar, ver audiomancy.environment) y sin cargar scaper, librosa, jams,
+requests ni mega. Este script mide el import en procesos nuevos y sale
+con código 1 si se pasa del límite o si alguno de esos módulos quedó
+cargado, para usarlo como control de regresión:
+
+    python benchmarks/bench_import.py --max-ms 200
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY = ['scaper', 'librosa', 'jams', 'requests', 'mega', 'sox', 'soundfile', 'numpy']
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import audiomancy
+elapsed = time.perf_counter() - start
+print(json.dumps({'ms': elapsed * 1e3, 'loaded': [m for m in %r if m in sys.modules]}))
+""" % HEAVY
+
+def _probe(root: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=root + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    output = subprocess.check_output([sys.executable, '-c', PROBE], env=env, text=True, cwd=root)
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=200.0, help='Límite para la mediana (milisegundos).')
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    runs = [_probe(root) for _ in range(args.runs)]
+    median = statistics.median(run['ms'] for run in runs)
+    loaded = sorted({m for run in runs for m in run['loaded']})
+
+    print(json.dumps({'median_ms': round(median, 2), 'runs_ms': [round(run['ms'], 2) for run in runs], 'heavy_loaded': loaded}))
+
+    failures = []
+    if median > args.max_ms:
+        failures.append(f'import audiomancy tarda {median:.1f} ms (límite: {args.max_ms} ms).')
+    if loaded:
+        failures.append(f'import audiomancy carga módulos pesados: {", ".join(loaded)}.')
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
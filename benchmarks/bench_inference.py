@@ -0,0 +1,55 @@
+"""Rendimiento y memoria de la inferencia por ventanas.
+
+Escribe una canción sintética de la duración pedida y la separa con
+BandSplitSeparator, midiendo segundos de audio procesados por segundo y
+el pico de RSS. El pico no debería crecer con --minutes:
+
+    python benchmarks/bench_inference.py --minutes 1 10 --batch-size 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def _run(minutes: float, batch_size: int, overlap: float, workdir: str) -> dict:
+    import numpy as np
+    import soundfile
+    from bench_pipeline import _peak_rss_mb
+    from audiomancy.models.inference import separate_file, BandSplitSeparator
+
+    sr = 44100
+    path = os.path.join(workdir, f'song_{minutes}.wav')
+    rng = np.random.default_rng(0)
+
+    with soundfile.SoundFile(path, 'w', samplerate=sr, channels=2, subtype='FLOAT') as f:
+        for _ in range(int(minutes * 60)):
+            f.write((0.1 * rng.standard_normal((sr, 2))).astype('float32'))
+
+    baseline = _peak_rss_mb()
+    start = time.perf_counter()
+    separate_file(path, BandSplitSeparator(sr), os.path.join(workdir, f'out_{minutes}'), overlap=overlap, batch_size=batch_size)
+    seconds = time.perf_counter() - start
+
+    return {'minutes': minutes, 'seconds': seconds, 'realtime_factor': minutes * 60 / seconds, 'peak_rss_mb': _peak_rss_mb(), 'rss_before_mb': baseline}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--minutes', type=float, nargs='+', default=[1, 5])
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--overlap', type=float, default=0.25)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory(prefix='audiomancy_infer_') as workdir:
+        for minutes in args.minutes:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                print(json.dumps(pool.submit(_run, minutes, args.batch_size, args.overlap, workdir).result()))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Benchmark del pipeline de datos sobre stems sintéticos.
+
+Mide tiempo, mezclas por segundo y pico de memoria (RSS) de cada etapa:
+generación de metadatos (generate_random), reconstrucción
+(read_from_jams con cada motor) y preprocesamiento (remove_silence,
+normalize_track y preprocess_stems), para varios tamaños. Cada etapa
+corre en un proceso nuevo para que el pico de RSS sea solo suyo.
+
+En las etapas de generación y reconstrucción se incluye además el
+resumen por etapa de audiomancy.metrics (lectura, decodificación,
+transformaciones, loudness, escritura en los tensores...).
+
+Los resultados se guardan en JSON junto con el commit, para comparar
+entre versiones:
+
+    python benchmarks/bench_pipeline.py --sizes 10 50 200 --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def _peak_rss_mb() -> float:
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 if sys.platform != 'darwin' else peak / 2**20
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 2**20
+
+def _run_stage(stage: str, workdir: str, n: int) -> dict:
+    """Corre una etapa dentro de un proceso nuevo."""
+    import numpy as np
+    np.float_ = np.float64
+    np.Inf = np.inf
+    from audiomancy.audioprocessing import cacophony, remove_silence, normalize_track, preprocess_stems
+    from audiomancy.metrics import Metrics
+
+    stems_path = os.path.join(workdir, 'stems')
+    jams_path = os.path.join(workdir, f'{n}_synthetic.jams')
+    metrics = Metrics()
+    start = time.perf_counter()
+
+    if stage == 'generation':
+        # Los puntos de control quedan en <jams_path>.parts, dentro de workdir.
+        cacophony(fg_path=stems_path, metrics=metrics).generate_random(n, jams_path=os.path.join(workdir, f'{n}_generated.jams'))
+        items = n
+    elif stage in ('reconstruction_sox', 'reconstruction_numpy'):
+        mixer = cacophony(fg_path=stems_path, engine=stage.split('_')[1], metrics=metrics)
+        mixer.read_from_jams(jams_path, dtype='float32')
+        items = n
+    elif stage == 'reconstruction_store':
+        mixer = cacophony(fg_path=stems_path, engine='numpy', metrics=metrics)
+        mixer.compile_stems(store_path=os.path.join(workdir, 'store'))
+        mixer.read_from_jams(jams_path, dtype='float32')
+        items = n
+    elif stage == 'remove_silence':
+        files = [os.path.join(root, f) for root, _, fs in os.walk(stems_path) for f in fs if f.endswith('.wav')]
+        for path in files:
+            remove_silence(path)
+        items = len(files)
+    elif stage == 'normalize_track':
+        rng = np.random.default_rng(0)
+        arrays = [rng.standard_normal((int(rng.uniform(3, 7) * 44100), 1)) for _ in range(n)]
+        start = time.perf_counter()
+        for arr in arrays:
+            normalize_track(arr)
+        items = n
+    elif stage == 'preprocess_stems':
+        copy_path = os.path.join(workdir, 'stems_copy')
+        shutil.rmtree(copy_path, ignore_errors=True)
+        shutil.copytree(stems_path, copy_path)
+        start = time.perf_counter()
+        preprocess_stems(copy_path)
+        items = sum(len(fs) for _, _, fs in os.walk(copy_path)) - 1
+    else:
+        raise ValueError(f'Etapa desconocida: {stage}')
+
+    seconds = time.perf_counter() - start
+    return {'seconds': seconds, 'items': items, 'items_per_second': items / seconds, 'peak_rss_mb': _peak_rss_mb(), 'metrics': metrics.summary()}
+
+STAGES = ['generation', 'reconstruction_sox', 'reconstruction_numpy', 'reconstruction_store', 'remove_silence', 'normalize_track', 'preprocess_stems']
+
+def _commit() -> str | None:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50], help='Cantidades de mezclas a medir.')
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES)
+    parser.add_argument('--per-label', type=int, default=8, help='Stems sintéticos por label.')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--workdir', default=None, help='Carpeta de trabajo (por defecto, una temporal).')
+    args = parser.parse_args()
+
+    from synthetic import build_stems, build_jams
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='audiomancy_bench_')
+    build_stems(os.path.join(workdir, 'stems'), per_label=args.per_label)
+
+    results = {
+        'commit': _commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'runs': []
+    }
+
+    context = multiprocessing.get_context('spawn')
+    for n in args.sizes:
+        build_jams(os.path.join(workdir, 'stems'), os.path.join(workdir, f'{n}_synthetic.jams'), n)
+
+        for stage in args.stages:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                try:
+                    run = pool.submit(_run_stage, stage, workdir, n).result()
+                except Exception as error:
+                    run = {'error': f'{type(error).__name__}: {error}'}
+
+            run.update(stage=stage, n=n)
+            results['runs'].append(run)
+            print(json.dumps(run))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'Resultados guardados en {args.output}')
+
+    if args.workdir is None:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Compara audiomancy.dsp.pitch_time contra librosa.
+
+Un seno se pasa por pitch_time y por librosa (time_stretch y resample)
+con varios parámetros; en la zona central de la salida se comparan la
+amplitud (RMS·√2) y la frecuencia dominante. Sale con código 1 si
+alguna difiere más de la tolerancia:
+
+    python benchmarks/check_dsp.py
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+np.float_ = np.float64
+np.Inf = np.inf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CASES = [(2, None), (-3, None), (None, 1.2), (None, 0.8), (1.5, 1.1)]
+
+def _measure(y, sr: int) -> tuple:
+    """Amplitud y frecuencia dominante de la mitad central de y."""
+    middle = y[len(y) // 4:-len(y) // 4]
+    spectrum = np.abs(np.fft.rfft(middle * np.hanning(len(middle))))
+    return float(np.sqrt(2) * middle.std()), float(np.fft.rfftfreq(len(middle), 1 / sr)[spectrum.argmax()])
+
+def _librosa(x, sr: int, pitch_shift, time_stretch):
+    """La misma descomposición con librosa: un time_stretch por
+    ts·2^(n/12) y un remuestreo (lo que hace librosa.effects.pitch_shift).
+    Encadenar time_stretch y pitch_shift pasaría dos veces por el phase
+    vocoder y no sería comparable.
+    """
+    import librosa
+
+    shift = 2.0 ** ((pitch_shift or 0.0) / 12.0)
+    y = librosa.effects.time_stretch(x, rate=1.0 / ((time_stretch or 1.0) * shift))
+    if shift != 1.0:
+        y = librosa.resample(y, orig_sr=sr * shift, target_sr=sr, res_type='soxr_hq')
+    return y
+
+def main():
+    from audiomancy.dsp import pitch_time
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--freq', type=float, default=440.0)
+    parser.add_argument('--peak', type=float, default=0.92)
+    parser.add_argument('--amp-tol', type=float, default=0.05, help='Diferencia relativa de amplitud permitida.')
+    parser.add_argument('--freq-tol', type=float, default=2.0, help='Diferencia de frecuencia permitida (hercios).')
+    args = parser.parse_args()
+
+    sr = 44100
+    x = args.peak * np.sin(2 * np.pi * args.freq * np.arange(2 * sr) / sr)
+    failures = []
+
+    for pitch_shift, time_stretch in CASES:
+        amp, freq = _measure(pitch_time(x, sr, pitch_shift, time_stretch), sr)
+        ref_amp, ref_freq = _measure(_librosa(x, sr, pitch_shift, time_stretch), sr)
+        result = {'pitch_shift': pitch_shift, 'time_stretch': time_stretch, 'amp': round(amp, 4), 'librosa_amp': round(ref_amp, 4), 'freq': round(freq, 2), 'librosa_freq': round(ref_freq, 2)}
+        print(json.dumps(result))
+
+        if abs(amp - ref_amp) > args.amp_tol * ref_amp or abs(freq - ref_freq) > args.freq_tol:
+            failures.append(result)
+
+    for failure in failures:
+        print(f'pitch_time difiere de librosa: {failure}', file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
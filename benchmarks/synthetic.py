@@ -0,0 +1,74 @@
+"""Árbol de stems sintético para medir el pipeline sin descargar los
+18 GB de stems reales.
+
+Genera la misma estructura que STEMS_PATH (una carpeta por cada label de
+LABELS) con tonos armónicos y ruido filtrado, con tramos de silencio
+para que remove_silence tenga trabajo, y un .jams con mezclas que
+apuntan a esos archivos.
+"""
+import os
+import numpy as np
+np.float_ = np.float64
+np.Inf = np.inf
+import soundfile
+
+from audiomancy.constants import LABELS
+from audiomancy.common.jamsio import JamsWriter
+from audiomancy.rendering import annotation_from_events
+
+def _stem(rng, seconds: float, sr: int, kind: str):
+    t = np.arange(int(seconds * sr)) / sr
+
+    if kind == 'tone':
+        f0 = rng.uniform(55, 880)
+        audio = sum(np.sin(2 * np.pi * f0 * h * t) / h for h in range(1, 6))
+    else:
+        audio = np.convolve(rng.standard_normal(t.shape[0]), np.ones(32) / 32, mode='same')
+
+    audio *= 0.3 / (np.max(np.abs(audio)) + 1e-10)
+
+    # Un par de tramos en silencio por archivo.
+    for _ in range(2):
+        start = rng.integers(0, t.shape[0])
+        audio[start:start + int(rng.uniform(0.2, 1.0) * sr)] = 0
+
+    return audio.astype('float32')
+
+def build_stems(stems_path: str, per_label: int = 8, seconds: float = 15.0, sr: int = 44100, seed: int = 0) -> list:
+    """Escribe per_label archivos .wav por label. Devuelve sus rutas."""
+    rng = np.random.default_rng(seed)
+    paths = []
+
+    for label in LABELS.keys():
+        os.makedirs(os.path.join(stems_path, label), exist_ok=True)
+        for i in range(per_label):
+            path = os.path.join(stems_path, label, f'{label}_{i}.wav')
+            soundfile.write(path, _stem(rng, seconds, sr, 'tone' if i % 2 == 0 else 'noise'), sr)
+            paths.append(path)
+
+    return paths
+
+def build_jams(stems_path: str, jams_path: str, n: int, duration: float = 5.0, seed: int = 0):
+    """Escribe un .jams con n mezclas de seis eventos sobre los stems
+    sintéticos, con los mismos rangos que generate_random.
+    """
+    rng = np.random.default_rng(seed)
+    files = {label: sorted(os.listdir(os.path.join(stems_path, label))) for label in LABELS.keys()}
+
+    with JamsWriter(jams_path) as writer:
+        for _ in range(n):
+            events = []
+            for label in LABELS.keys():
+                stretch = rng.uniform(0.8, 1.2)
+                events.append({
+                    'label': label,
+                    'source_file': os.path.join(stems_path, label, files[label][rng.integers(len(files[label]))]),
+                    'source_time': rng.uniform(0, 7),
+                    'event_time': 0,
+                    'event_duration': duration / stretch,
+                    'snr': rng.uniform(-5, 5),
+                    'role': 'foreground',
+                    'pitch_shift': rng.uniform(-2, 2),
+                    'time_stretch': stretch
+                })
+            writer.write(annotation_from_events(events, stems_path, duration=duration))